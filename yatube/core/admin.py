@@ -0,0 +1,102 @@
+"""Админка для больших таблиц.
+
+LargeTableAdmin не считает всю таблицу ради заголовка списка: число
+записей с фильтрами берётся из FeedPaginator (COUNT(*) ограничен
+ADMIN_COUNT_LIMIT строками и кэшируется на ADMIN_COUNT_TTL секунд),
+полное число не выводится. Список в сортировке по умолчанию листается
+по курсору (KeysetPaginator), а не по OFFSET, поэтому дальние страницы
+стоят столько же, сколько первая."""
+import hashlib
+import time
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.utils import timezone
+
+from .models import Task
+from .pagination import FeedPaginator, KeysetPaginator
+
+CURSOR_VAR: str = 'cursor'
+
+
+class KeysetChangeList(ChangeList):
+    """Список объектов админки с переходом по курсору.
+
+    Курсор используется, пока не выбраны другая сортировка, номер
+    страницы или «Показать все»; иначе список работает как обычно."""
+
+    def __init__(self, request, *args, **kwargs) -> None:
+        self.cursor: Optional[str] = request.GET.get(CURSOR_VAR)
+        self.page_requested: bool = PAGE_VAR in request.GET
+        self.keyset_page = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def uses_keyset(self) -> bool:
+        return (self.model_admin.keyset_ordering is not None
+                and not self.show_all and not self.page_requested
+                and ORDER_VAR not in self.params)
+
+    def get_results(self, request) -> None:
+        super().get_results(request)
+        if not self.uses_keyset() or not self.multi_page:
+            return
+        paginator = KeysetPaginator(
+            self.queryset, self.list_per_page,
+            ordering=self.model_admin.keyset_ordering,
+            cursor_param=CURSOR_VAR)
+        page = self.keyset_page = paginator.page(self.cursor)
+        self.result_list = page.object_list
+        self.first_page_url = self.get_query_string(remove=[CURSOR_VAR])
+        self.previous_page_url = self.get_query_string(
+            {CURSOR_VAR: page.previous_cursor})
+        self.next_page_url = self.get_query_string(
+            {CURSOR_VAR: page.next_cursor})
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """ModelAdmin для таблиц в миллионы строк."""
+    paginator = FeedPaginator
+    show_full_result_count: bool = False
+    # Сортировка курсора; последнее поле уникально. None - без курсора.
+    keyset_ordering: Optional[Tuple[str, ...]] = ('-created', '-id')
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        # Число записей общее для всех администраторов с теми же
+        # фильтрами и пересчитывается не чаще раза в ADMIN_COUNT_TTL.
+        params = request.GET.copy()
+        for name in (PAGE_VAR, CURSOR_VAR, ORDER_VAR):
+            params.pop(name, None)
+        digest = hashlib.md5(params.urlencode().encode()).hexdigest()
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            count_key=f'admin:{self.opts.label_lower}:{digest}',
+            count_stamp=int(time.time() // settings.ADMIN_COUNT_TTL),
+            count_limit=settings.ADMIN_COUNT_LIMIT,
+        )
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'priority', 'attempts',
+                    'run_after', 'locked_by')
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    ordering = ('priority', 'run_after', 'id')
+    readonly_fields = ('created', 'locked_at', 'last_error')
+    actions = ('retry',)
+
+    def retry(self, request, queryset) -> None:
+        queryset.update(status=Task.QUEUED, locked_by='',
+                        run_after=timezone.now())
+    retry.short_description = 'Выполнить ещё раз'
@@ -0,0 +1,41 @@
+"""Бюджеты SQL-запросов представлений.
+
+Бюджет - верхняя граница числа запросов на один ответ (включая сессию
+и пользователя), которая не должна зависеть от объёма данных. Задаётся
+атрибутом query_budget класса-представления или декоратором
+query_budget для функций. Проверяется тестовым клиентом
+core.test.BudgetClient и, на стенде, QueryBudgetMiddleware."""
+from typing import Callable, Optional
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше запросов, чем ему разрешено."""
+
+
+def query_budget(limit: int) -> Callable:
+    """Декоратор бюджета запросов для представления-функции."""
+    def decorator(view: Callable) -> Callable:
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def get_budget(view: Optional[Callable]) -> Optional[int]:
+    """Бюджет представления из resolver_match.func или None."""
+    if view is None:
+        return None
+    budget = getattr(view, 'query_budget', None)
+    if budget is None:
+        budget = getattr(
+            getattr(view, 'view_class', None), 'query_budget', None)
+    return budget
+
+
+def check_budget(view: Optional[Callable], queries: int,
+                 view_name: str = '') -> Optional[str]:
+    """Сообщение о превышении бюджета или None."""
+    budget = get_budget(view)
+    if budget is None or queries <= budget:
+        return None
+    return (f'{view_name or view}: {queries} SQL-запросов '
+            f'при бюджете {budget}')
@@ -0,0 +1,196 @@
+"""Двухуровневый кэш и защита от одновременной пересборки.
+
+TieredCache - бэкенд django.core.cache: LRU в памяти процесса (L1)
+перед общим для всех процессов кэшем (L2, алиас из OPTIONS['L2']).
+Чтение идёт из L1, промах - из L2 с запоминанием в L1 не дольше
+L1_TIMEOUT секунд. Запись идёт в L2 и в L1 своего процесса.
+
+Чужие L1 о перезаписи не узнают и отдают прежнее значение, пока
+не истечёт L1_TIMEOUT. Поэтому значения, которые меняются на месте
+и должны сразу читаться всеми процессами, либо содержат версию
+в ключе (фрагменты лент - поколение, буферы posts.recent - своё
+поколение), либо читаются только из L2: ключи с префиксами
+OPTIONS['L2_ONLY'] (по умолчанию поколения core.generations)
+в L1 не попадают. Записи, сверяемые с поколениями при чтении
+(страницы и оболочки core.middleware), устаревшая копия в L1
+не портит: она просто не совпадёт с поколениями.
+
+get_or_build() пересобирает значение по аренде: промахнувшись,
+пересобирает только процесс, взявший аренду в L2, остальные ждут
+его результата."""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+LEASE_KEY: str = 'lease:%s'
+LEASE_POLL: float = 0.05
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location: str, params: Dict[str, Any]) -> None:
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias: str = options.get('L2', 'shared')
+        self.local_max_entries: int = options.get('L1_MAX_ENTRIES', 1000)
+        self.local_timeout: float = options.get('L1_TIMEOUT', 5)
+        self.shared_only: Tuple[str, ...] = tuple(
+            options.get('L2_ONLY', ('generation:',)))
+        self._local: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @cached_property
+    def shared(self) -> BaseCache:
+        """Общий кэш (L2)."""
+        return caches[self.shared_alias]
+
+    def _local_key(self, key, version) -> Optional[str]:
+        """Ключ L1 или None, если ключ читается только из L2."""
+        if key.startswith(self.shared_only):
+            return None
+        return self.shared.make_key(key, version=version)
+
+    def _remember(self, local_key: Optional[str], value: Any,
+                  timeout=None) -> None:
+        if local_key is None:
+            return
+        if timeout is None or timeout is DEFAULT_TIMEOUT:
+            timeout = self.local_timeout
+        else:
+            timeout = min(timeout, self.local_timeout)
+        if timeout <= 0:
+            self._forget(local_key)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[local_key] = (time.monotonic() + timeout, data)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _recall(self, local_key: Optional[str]) -> Optional[bytes]:
+        if local_key is None:
+            return None
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires < time.monotonic():
+                del self._local[local_key]
+                return None
+            self._local.move_to_end(local_key)
+            return data
+
+    def _forget(self, *local_keys: Optional[str]) -> None:
+        with self._lock:
+            for local_key in local_keys:
+                self._local.pop(local_key, None)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        data = self._recall(local_key)
+        if data is not None:
+            return pickle.loads(data)
+        value = self.shared.get(key, version=version)
+        if value is None:
+            return default
+        self._remember(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None) -> Dict[str, Any]:
+        found, missing = {}, []
+        for key in keys:
+            data = self._recall(self._local_key(key, version))
+            if data is not None:
+                found[key] = pickle.loads(data)
+            else:
+                missing.append(key)
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            for key, value in shared.items():
+                self._remember(self._local_key(key, version), value)
+            found.update(shared)
+        return found
+
+    def has_key(self, key, version=None) -> bool:
+        return (self._recall(self._local_key(key, version)) is not None
+                or self.shared.has_key(key, version=version))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._remember(self._local_key(key, version), value, timeout)
+        return added
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> None:
+        self.shared.set(key, value, timeout, version=version)
+        self._remember(self._local_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None) -> list:
+        failed = self.shared.set_many(data, timeout, version=version) or []
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(self._local_key(key, version), value, timeout)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None) -> int:
+        value = self.shared.incr(key, delta, version=version)
+        self._forget(self._local_key(key, version))
+        return value
+
+    def delete(self, key, version=None) -> None:
+        self.shared.delete(key, version=version)
+        self._forget(self._local_key(key, version))
+
+    def delete_many(self, keys, version=None) -> None:
+        self.shared.delete_many(keys, version=version)
+        self._forget(*(self._local_key(key, version) for key in keys))
+
+    def clear(self) -> None:
+        self.shared.clear()
+        with self._lock:
+            self._local.clear()
+
+    def close(self, **kwargs) -> None:
+        self.shared.close(**kwargs)
+
+
+def get_or_build(key: str, build: Callable[[], Any], timeout=DEFAULT_TIMEOUT,
+                 cache: BaseCache = default_cache) -> Any:
+    """Значение из кэша или собранное build() одним процессом.
+
+    Промахнувшийся процесс берёт аренду ключа в общем кэше
+    на CACHE_LEASE_TIMEOUT секунд, собирает и записывает значение.
+    Остальные до CACHE_LEASE_WAIT секунд ждут появления значения,
+    а не дождавшись, собирают его сами без записи в кэш."""
+    value = cache.get(key)
+    if value is not None:
+        return value
+    # Аренда меняется на месте и живёт только в L2.
+    shared = getattr(cache, 'shared', cache)
+    lease = LEASE_KEY % key
+    if shared.add(lease, True, settings.CACHE_LEASE_TIMEOUT):
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+        finally:
+            shared.delete(lease)
+        return value
+    deadline = time.monotonic() + settings.CACHE_LEASE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LEASE_POLL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return build()
@@ -0,0 +1,55 @@
+"""Счётчики поколений для кэша отрисованных страниц.
+
+Ключ закэшированного фрагмента включает текущие поколения его областей
+(scope). Изменение данных сдвигает поколение области, и старые
+фрагменты перестают читаться, поэтому кэш может жить часами,
+не отдавая изменённые или удалённые посты. Значение поколения -
+момент последнего изменения в микросекундах: после вытеснения ключа
+из кэша новое поколение всегда больше прежних."""
+import time
+from typing import Dict
+
+from django.core.cache import cache
+
+GLOBAL_SCOPE: str = 'global'
+KEY_TEMPLATE: str = 'generation:%s'
+
+
+def _now() -> int:
+    return time.time_ns() // 1000
+
+
+def get_generations(*scopes: str) -> Dict[str, int]:
+    """Текущие поколения областей одним запросом к кэшу."""
+    keys = {KEY_TEMPLATE % scope: scope for scope in scopes}
+    found = cache.get_many(keys)
+    generations = {}
+    for key, scope in keys.items():
+        if key not in found:
+            cache.add(key, _now(), timeout=None)
+            found[key] = cache.get(key)
+        generations[scope] = found[key]
+    return generations
+
+
+def generation_key(*scopes: str) -> str:
+    """Строка поколений для ключа фрагмента."""
+    generations = get_generations(*scopes)
+    return '-'.join(str(generations[scope]) for scope in scopes)
+
+
+def bump(*scopes: str) -> None:
+    """Сдвигает поколения областей после изменения данных."""
+    now = _now()
+    cache.set_many(
+        {KEY_TEMPLATE % scope: now for scope in set(scopes) if scope},
+        timeout=None)
+
+
+def post_scopes(post, *extra_group_ids) -> list:
+    """Области лент, в которых показывается пост."""
+    scopes = ['index', f'profile:{post.author_id}', f'post:{post.pk}']
+    for group_id in (post.group_id, *extra_group_ids):
+        if group_id:
+            scopes.append(f'group:{group_id}')
+    return scopes
@@ -0,0 +1,74 @@
+"""Страница-оболочка с «дырками» под фрагменты конкретного пользователя.
+
+Фрагмент, зависящий от зрителя (шапка, кнопки подписки и правки, форма
+комментария), выводится тегом {% hole %} из core/templatetags/holes.py.
+При обычной отрисовке он рисуется в контексте страницы и обрамляется
+метками. HolePunchMiddleware вырезает из такой страницы оболочку,
+в которой фрагменты заменены заглушками, и кэширует её одну на всех
+пользователей. Следующему зрителю заглушки заполняются заново: шаблон
+фрагмента рисуется с аргументами тега, контекстом запроса (user,
+request, csrf_token) и данными поставщика, зарегистрированного
+для шаблона декоратором provides.
+
+Аргументы тега сериализуются в JSON, поэтому передаются id и строки,
+а не объекты моделей."""
+import base64
+import json
+import re
+from typing import Any, Callable, Dict, Tuple
+
+from django.template.loader import render_to_string
+
+OPEN: str = '<!--hole:%s-->'
+CLOSE: str = '<!--/hole-->'
+SLOT: str = '<!--hole-slot:%s-->'
+HOLE_RE = re.compile(
+    r'<!--hole:(?P<spec>[A-Za-z0-9_=-]+)-->(?P<html>.*?)<!--/hole-->', re.S)
+SLOT_RE = re.compile(r'<!--hole-slot:(?P<spec>[A-Za-z0-9_=-]+)-->')
+
+Provider = Callable[..., Dict[str, Any]]
+_providers: Dict[str, Provider] = {}
+
+
+def provides(template_name: str) -> Callable[[Provider], Provider]:
+    """Регистрирует поставщика контекста фрагмента для заполнения
+    оболочки: provider(request, **аргументы тега) -> dict."""
+    def decorator(provider: Provider) -> Provider:
+        _providers[template_name] = provider
+        return provider
+    return decorator
+
+
+def encode(template_name: str, kwargs: Dict[str, Any]) -> str:
+    data = json.dumps([template_name, kwargs], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode(spec: str) -> Tuple[str, Dict[str, Any]]:
+    template_name, kwargs = json.loads(base64.urlsafe_b64decode(spec))
+    return template_name, kwargs
+
+
+def wrap(template_name: str, kwargs: Dict[str, Any], html: str) -> str:
+    return OPEN % encode(template_name, kwargs) + html + CLOSE
+
+
+def split(content: str) -> Tuple[str, str]:
+    """Оболочка для кэша и страница текущего зрителя без меток."""
+    shell = HOLE_RE.sub(lambda match: SLOT % match['spec'], content)
+    page = HOLE_RE.sub(lambda match: match['html'], content)
+    return shell, page
+
+
+def render(request, spec: str) -> str:
+    template_name, kwargs = decode(spec)
+    context = dict(kwargs)
+    provider = _providers.get(template_name)
+    if provider is not None:
+        context.update(provider(request, **kwargs))
+    return render_to_string(template_name, context, request=request)
+
+
+def fill(request, shell: str) -> str:
+    """Заполняет заглушки оболочки фрагментами зрителя."""
+    return SLOT_RE.sub(lambda match: render(request, match['spec']), shell)
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import \
+    KVStore as CachedDBKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class KVStore(CachedDBKVStore):
+    """Хранилище метаданных sorl.thumbnail с LRU в памяти процесса.
+
+    Порядок чтения: LRU процесса, общий кэш, база данных. Метаданные
+    миниатюры не меняются, пока жив её ключ, поэтому в LRU хранятся
+    только найденные значения. Промах (миниатюра ещё не нарезана)
+    кэшируется как EMPTY_VALUE лишь на THUMBNAIL_MISS_TIMEOUT секунд,
+    а не на THUMBNAIL_CACHE_TIMEOUT, как в sorl: миниатюра, нарезанная
+    другим процессом, появляется не позже, чем истечёт промах, даже
+    если общий кэш на самом деле свой у каждого процесса."""
+
+    def __init__(self):
+        super().__init__()
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, value: str) -> None:
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > settings.THUMBNAIL_LOCAL_CACHE_SIZE:
+                self._local.popitem(last=False)
+
+    def _cache_many(self, values: Dict[str, Optional[str]]) -> None:
+        """Кладёт значения из базы в общий кэш, None - как промах."""
+        found = {key: value for key, value in values.items()
+                 if value is not None}
+        missing = [key for key, value in values.items() if value is None]
+        if found:
+            self.cache.set_many(found, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        if missing:
+            self.cache.set_many(dict.fromkeys(missing, EMPTY_VALUE),
+                                settings.THUMBNAIL_MISS_TIMEOUT)
+
+    def _get_raw(self, key):
+        with self._lock:
+            value = self._local.get(key)
+            if value is not None:
+                self._local.move_to_end(key)
+                return value
+        value = self.cache.get(key)
+        if value is None:
+            value = KVStoreModel.objects.filter(key=key).values_list(
+                'value', flat=True).first()
+            self._cache_many({key: value})
+        if value is None or value == EMPTY_VALUE:
+            return None
+        self._remember(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    def prefetch(self, image_files: Iterable[ImageFile]) -> None:
+        """Загружает метаданные нескольких файлов одним обращением
+        к общему кэшу и не более чем одним запросом к базе."""
+        with self._lock:
+            keys: List[str] = [
+                key for key in {add_prefix(image.key) for image in image_files}
+                if key not in self._local
+            ]
+        if not keys:
+            return
+        found = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            from_db = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            self._cache_many({key: from_db.get(key) for key in missing})
+            found.update(from_db)
+        for key, value in found.items():
+            if value != EMPTY_VALUE:
+                self._remember(key, value)
@@ -0,0 +1,53 @@
+import multiprocessing
+import os
+import socket
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _worker_name() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _run_worker(burst: bool) -> None:
+    # Процесс запущен через spawn: модели импортируются после setup().
+    import django
+    django.setup()
+    from core import tasks
+    tasks.work(_worker_name(), burst=burst)
+
+
+class Command(BaseCommand):
+    help = 'Запускает исполнителей фоновых задач (core.tasks).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов-исполнителей.')
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выполнить задачи очереди и выйти.')
+
+    def handle(self, *args, **options):
+        from core import tasks
+        if options['workers'] <= 1:
+            done = tasks.work(_worker_name(), burst=options['burst'])
+            self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
+            return
+        # Соединения с базой не должны достаться дочерним процессам.
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        processes = [
+            context.Process(target=_run_worker, args=(options['burst'],))
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+                process.join()
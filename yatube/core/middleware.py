@@ -0,0 +1,258 @@
+import hashlib
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from typing import Dict
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+
+from . import holes, timing, validators
+from .budgets import QueryBudgetExceeded, check_budget
+from .generations import get_generations
+
+logger = logging.getLogger('core.timing')
+budget_logger = logging.getLogger('core.budgets')
+
+PAGE_KEY: str = 'page:%s'
+SHELL_KEY: str = 'page-shell:%s'
+
+
+def page_key(template: str, request) -> str:
+    return template % hashlib.md5(
+        request.build_absolute_uri().encode()).hexdigest()
+
+
+class RequestTimingMiddleware:
+    """Число и время SQL-запросов, время отрисовки шаблона и миниатюр.
+
+    Замеряет долю settings.REQUEST_TIMING_SAMPLE_RATE запросов и пишет
+    результат в заголовок Server-Timing и в лог core.timing строкой JSON.
+    При доле 0 middleware отключается целиком. Ставится первым
+    в MIDDLEWARE, чтобы total охватывал остальные middleware."""
+
+    def __init__(self, get_response):
+        self.rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        if not self.rate:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self.rate < 1 and random.random() >= self.rate:
+            return self.get_response(request)
+        timings = timing.RequestTimings()
+        token = timing.current.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            timing.current.reset(token)
+        self.report(request, response, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        """Отмечает начало и конец отрисовки TemplateResponse.
+
+        Ленивые запросы к базе из шаблона учитываются в SQL,
+        а из времени отрисовки вычитаются."""
+        timings = timing.current.get()
+        if timings is None:
+            return response
+        start = time.perf_counter()
+        sql_before = timings.sql_time
+
+        def rendered(response):
+            timings.spans['render'] += (
+                time.perf_counter() - start
+                - (timings.sql_time - sql_before))
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def report(self, request, response, timings) -> None:
+        total = timings.total
+        durations = {
+            'sql': timings.sql_time,
+            **timings.spans,
+            'total': total,
+        }
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration * 1000:.1f}'
+            + (f';desc="{timings.sql_count} queries"' if name == 'sql' else '')
+            for name, duration in durations.items()
+        )
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'sql_count': timings.sql_count,
+            **{f'{name}_ms': round(duration * 1000, 1)
+               for name, duration in durations.items()},
+        }, ensure_ascii=False))
+
+
+class QueryBudgetMiddleware:
+    """Проверка бюджетов запросов (core.budgets) на стенде.
+
+    settings.QUERY_BUDGET_ACTION: 'log' - предупреждение в лог
+    core.budgets, 'raise' - исключение QueryBudgetExceeded,
+    None - middleware отключается."""
+
+    def __init__(self, get_response):
+        self.action = settings.QUERY_BUDGET_ACTION
+        if self.action not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is None:
+            return response
+        error = check_budget(match.func, counter.count, match.view_name)
+        if error and self.action == 'raise':
+            raise QueryBudgetExceeded(error)
+        if error:
+            budget_logger.warning(error)
+        return response
+
+
+class QueryCounter:
+    """Обёртка connection.execute_wrapper, считающая запросы."""
+
+    def __init__(self) -> None:
+        self.count: int = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class AnonymousPageCacheMiddleware:
+    """Готовые страницы для анонимных посетителей из кэша.
+
+    Кэшируются ответы представлений с core.views.ConditionalGetMixin:
+    оно записывает в request.page_generations поколения областей
+    страницы - её суррогатные ключи (пост, автор, группа, лента).
+    Запись хранится вместе с этими поколениями, и их сдвиг сигналами
+    Post, Comment, Follow и Group делает запись недействительной.
+    Ключ - адрес с параметрами запроса. Посетитель с cookie сессии или
+    сообщений считается неанонимным и обслуживается как обычно.
+
+    Ставится перед SessionMiddleware: попадание не трогает ни сессию,
+    ни пользователя, ни шаблоны. Включается settings.PAGE_CACHE_ENABLED."""
+
+    def __init__(self, get_response):
+        if not settings.PAGE_CACHE_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_anonymous(request):
+            return self.get_response(request)
+        key = page_key(PAGE_KEY, request)
+        cached = cache.get(key)
+        if cached is not None:
+            generations, response = cached
+            if get_generations(*generations) == generations:
+                return self.conditional(request, response)
+        response = self.get_response(request)
+        if self.is_cacheable(request, response):
+            cache.set(key, (request.page_generations, response),
+                      settings.PAGE_CACHE_TIME)
+        return response
+
+    def is_anonymous(self, request) -> bool:
+        return (request.method in ('GET', 'HEAD')
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES
+                and CookieStorage.cookie_name not in request.COOKIES)
+
+    def is_cacheable(self, request, response) -> bool:
+        user = getattr(request, 'user', None)
+        return (request.method == 'GET'
+                and response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and getattr(request, 'page_generations', None) is not None
+                and (user is None or not user.is_authenticated))
+
+    def conditional(self, request, response):
+        return get_conditional_response(
+            request, etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')),
+            response=response)
+
+
+class HolePunchMiddleware:
+    """Общая для всех зрителей оболочка страницы (core.holes).
+
+    Убирает метки фрагментов {% hole %} из HTML-ответа. Если включён
+    settings.PAGE_CACHE_ENABLED, оболочку страницы с суррогатными
+    ключами (см. AnonymousPageCacheMiddleware) кэширует, а следующим
+    запросам, в том числе вошедших пользователей, отдаёт её
+    с дорисованными фрагментами, не вызывая представление. Такой ответ
+    несёт те же валидаторы (core.validators), что и страница
+    представления, и на повторный запрос отвечает 304 без отрисовки
+    фрагментов. Ставится после AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.PAGE_CACHE_ENABLED
+
+    def __call__(self, request):
+        cacheable = self.enabled and request.method in ('GET', 'HEAD')
+        if cacheable:
+            key = page_key(SHELL_KEY, request)
+            cached = cache.get(key)
+            if cached is not None:
+                generations, shell, content_type = cached
+                if get_generations(*generations) == generations:
+                    return self.filled(
+                        request, generations, shell, content_type)
+        response = self.get_response(request)
+        if (response.streaming
+                or 'html' not in response.get('Content-Type', '')):
+            return response
+        content = response.content.decode(response.charset)
+        if holes.CLOSE not in content:
+            return response
+        shell, page = holes.split(content)
+        generations = getattr(request, 'page_generations', None)
+        if (cacheable and request.method == 'GET'
+                and response.status_code == 200 and generations is not None):
+            cache.set(key, (generations, shell, response['Content-Type']),
+                      settings.PAGE_CACHE_TIME)
+        response.content = page
+        return response
+
+    def filled(self, request, generations: Dict[str, int], shell: str,
+               content_type: str) -> HttpResponse:
+        # Заполненную страницу может сохранить для анонимных
+        # посетителей AnonymousPageCacheMiddleware.
+        request.page_generations = generations
+        etag, last_modified = validators.page_validators(request, generations)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(
+                holes.fill(request, shell), content_type=content_type)
+        patch_vary_headers(response, ('Cookie',))
+        validators.patch_validators(request, response, etag, last_modified)
+        return response
@@ -1,13 +1,113 @@
 from django.db import models
+from django.utils import timezone
 
 
 class BaseModel(models.Model):
-    """Абстрактная модель. Добавляет дату создания."""
+    """Абстрактная модель. Добавляет дату создания и изменения.
+
+    updated меняется при каждом save() (но не при QuerySet.update()),
+    по нему проверяются кэши и HTTP-валидаторы."""
     created = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
         db_index=True)
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True)
     text = models.TextField('Текст', help_text='Введите текст')
 
     class Meta:
         abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'updated'}
+        super().save(*args, **kwargs)
+
+
+def cut_at_word(text: str, length: int) -> str:
+    """Начало text не длиннее length символов с «…» в конце.
+
+    Обрезается по последнему пробелу перед границей; слово длиннее
+    length режется посередине."""
+    if len(text) <= length:
+        return text
+    head = text[:length - 1]
+    if not text[length - 1].isspace():
+        words = head.rsplit(None, 1)
+        if len(words) == 2:
+            head = words[0]
+    return head.rstrip() + '…'
+
+
+class ExcerptField(models.CharField):
+    """Начало текстового поля source_field, обрезанное по слову.
+
+    Заполняется при каждом сохранении, в том числе в bulk_create,
+    как auto_now у дат."""
+
+    def __init__(self, *args, source_field: str = 'text', **kwargs):
+        self.source_field = source_field
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('blank', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.source_field != 'text':
+            kwargs['source_field'] = self.source_field
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = cut_at_word(
+            getattr(model_instance, self.source_field) or '',
+            self.max_length)
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class Task(models.Model):
+    """Фоновая задача в очереди (core.tasks).
+
+    Выполненная задача удаляется, исчерпавшая попытки остаётся
+    со статусом FAILED и текстом последней ошибки."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+    PRIORITY_HIGH = 0
+    PRIORITY_NORMAL = 5
+    PRIORITY_LOW = 9
+
+    name = models.CharField('Задача', max_length=200)
+    arguments = models.TextField('Аргументы (JSON)', default='[[], {}]')
+    priority = models.SmallIntegerField(
+        'Приоритет', default=PRIORITY_NORMAL, help_text='Меньше - раньше')
+    status = models.CharField(
+        'Статус', max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Попыток не больше', default=3)
+    run_after = models.DateTimeField('Выполнить после', default=timezone.now)
+    locked_by = models.CharField('Исполнитель', max_length=100, blank=True)
+    locked_at = models.DateTimeField('Взята', blank=True, null=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Поставлена', auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        # Очередь: задачи статуса по приоритету и сроку.
+        indexes = [
+            models.Index(fields=['status', 'priority', 'run_after'],
+                         name='task_queue'),
+        ]
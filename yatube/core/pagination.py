@@ -0,0 +1,304 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import (Any, Hashable, Iterator, List, Optional, Sequence, Tuple,
+                    Union)
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.utils.functional import cached_property
+
+CURSOR_SALT: str = 'core.pagination.cursor'
+FORWARD: str = 'n'
+BACKWARD: str = 'p'
+ELLIPSIS: str = '…'
+COUNT_KEY: str = 'feed-count:%s'
+REFRESH_KEY: str = 'feed-count-refresh:%s'
+REFRESH_TIMEOUT: int = 60
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1)
+    return _executor
+
+
+def bounded_count(object_list, limit: Optional[int]) -> int:
+    """COUNT(*), который останавливается после limit + 1 строки."""
+    if limit is None or not isinstance(object_list, QuerySet):
+        return Paginator(object_list, 1).count
+    return object_list.order_by()[:limit + 1].count()
+
+
+def refresh_count(key: str, stamp: Hashable, object_list,
+                  limit: Optional[int]) -> int:
+    count = bounded_count(object_list, limit)
+    cache.set(COUNT_KEY % key, (stamp, count), settings.FEED_CACHE_TIME)
+    return count
+
+
+def schedule_refresh(key: str, stamp: Hashable, object_list,
+                     limit: Optional[int]) -> None:
+    """Пересчитывает число в фоновом потоке, не чаще одного раза
+    на ключ одновременно."""
+    # Отметка меняется на месте и живёт только в L2 (core.cache).
+    shared = getattr(cache, 'shared', cache)
+    if not shared.add(REFRESH_KEY % key, True, REFRESH_TIMEOUT):
+        return
+
+    def refresh() -> None:
+        try:
+            refresh_count(key, stamp, object_list, limit)
+        finally:
+            shared.delete(REFRESH_KEY % key)
+            connections.close_all()
+
+    get_executor().submit(refresh)
+
+
+class FeedPaginator(Paginator):
+    """Пагинатор ленты с коротким списком страниц и дешёвым count.
+
+    Число ссылок на страницы не зависит от длины ленты. Число постов
+    берётся, по порядку:
+      known_count - из денормализованного счётчика (AuthorStats),
+      который сигналы держат точным;
+      из кэша по count_key, если count_stamp (поколение ленты) совпал;
+      устаревшее из кэша, пока фоновый поток считает новое
+      (settings.FEED_COUNT_ASYNC);
+      COUNT(*), ограниченный count_limit строками.
+    Лента длиннее count_limit показывается как «много страниц»:
+    без последней страницы и её номера."""
+
+    def __init__(self, object_list, per_page, orphans: int = 0,
+                 allow_empty_first_page: bool = True,
+                 count_key: Optional[str] = None,
+                 count_stamp: Hashable = None,
+                 known_count: Optional[int] = None,
+                 count_limit: Optional[int] = None) -> None:
+        super().__init__(object_list, per_page, orphans,
+                         allow_empty_first_page)
+        self.count_key = count_key
+        self.count_stamp = count_stamp
+        self.known_count = known_count
+        self.count_limit = count_limit
+        # Устаревшее число из кэша может отставать от базы: номер
+        # страницы не проверяется сверху.
+        self.approximate = False
+
+    @cached_property
+    def count(self) -> int:
+        if self.known_count is not None:
+            return self.known_count
+        if self.count_key is None:
+            return bounded_count(self.object_list, self.count_limit)
+        cached = cache.get(COUNT_KEY % self.count_key)
+        if cached is not None:
+            stamp, count = cached
+            if stamp == self.count_stamp:
+                return count
+            if settings.FEED_COUNT_ASYNC:
+                self.approximate = True
+                schedule_refresh(self.count_key, self.count_stamp,
+                                 self.object_list, self.count_limit)
+                return count
+        return refresh_count(self.count_key, self.count_stamp,
+                             self.object_list, self.count_limit)
+
+    @property
+    def many_pages(self) -> bool:
+        return self.count_limit is not None and self.count > self.count_limit
+
+    def validate_number(self, number) -> int:
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if (self.approximate or self.many_pages) and int(number) > 1:
+                return int(number)
+            raise
+
+    def page(self, number) -> Page:
+        number = self.validate_number(number)
+        if not (self.approximate or self.many_pages):
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        if not self.many_pages:
+            return self._get_page(
+                self.object_list[bottom:bottom + self.per_page], number, self)
+        # Длина ленты за count_limit неизвестна: следующая страница
+        # есть, если за текущей нашлась ещё одна строка.
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if len(rows) > self.per_page:
+            self.num_pages = max(self.num_pages, number + 1)
+        return self._get_page(rows[:self.per_page], number, self)
+
+    def get_elided_page_range(self, number: int = 1, on_each_side: int = 3,
+                              on_ends: int = 2) -> Iterator[Union[int, str]]:
+        """Номера страниц: края, окно вокруг number и ELLIPSIS на месте
+        пропусков (как Paginator.get_elided_page_range в Django 3.2)."""
+        number = self.validate_number(number)
+        if (not self.many_pages
+                and self.num_pages <= (on_each_side + on_ends) * 2):
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if self.many_pages:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield ELLIPSIS
+        elif number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield ELLIPSIS
+            yield from range(
+                self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class KeysetPage(Sequence):
+    """Страница, построенная по курсору.
+
+    В отличие от django.core.paginator.Page не знает своего номера
+    и общего количества страниц, только соседей."""
+    is_keyset: bool = True
+
+    def __init__(self, object_list: List[Any], paginator: 'KeysetPaginator',
+                 next_cursor: Optional[str] = None,
+                 previous_cursor: Optional[str] = None) -> None:
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self) -> str:
+        return f'<KeysetPage of {len(self)} objects>'
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Пагинация по ключу сортировки вместо OFFSET.
+
+    Стоимость запроса одинакова для любой страницы: выборка идёт
+    от значений ключа последней (первой) записи соседней страницы,
+    которые передаются в подписанном курсоре. COUNT(*) не выполняется.
+    Последнее поле сортировки должно быть уникальным (обычно id)."""
+
+    def __init__(self, object_list: QuerySet, per_page: int,
+                 ordering: Tuple[str, ...] = ('-created', '-id'),
+                 cursor_param: str = 'cursor') -> None:
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.cursor_param = cursor_param
+        self._fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+
+    @property
+    def descending(self) -> bool:
+        return self._fields[0][1]
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        """Возвращает страницу, следующую (или предшествующую) курсору."""
+        if not cursor:
+            return self._forward_page(None)
+        direction, key = self.decode_cursor(cursor)
+        if direction == BACKWARD:
+            return self._backward_page(key)
+        return self._forward_page(key)
+
+    def encode_cursor(self, direction: str, obj: Any) -> str:
+        values = []
+        for name, _ in self._fields:
+            value = getattr(obj, name)
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value)
+        return signing.dumps([direction, values], salt=CURSOR_SALT)
+
+    def decode_cursor(self, cursor: str) -> Tuple[str, List[Any]]:
+        try:
+            direction, values = signing.loads(cursor, salt=CURSOR_SALT)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise Http404('Неверный курсор страницы')
+        if (direction not in (FORWARD, BACKWARD)
+                or len(values) != len(self._fields)):
+            raise Http404('Неверный курсор страницы')
+        opts = self.object_list.model._meta
+        return direction, [
+            opts.get_field(name).to_python(value)
+            for (name, _), value in zip(self._fields, values)
+        ]
+
+    def _seek(self, key: List[Any], forward: bool) -> Q:
+        """Условие «строго после ключа» в порядке обхода.
+
+        Нестрогая граница по первому полю стоит отдельно от OR: по ней
+        база выбирает диапазон индекса и не сортирует результат."""
+        name, descending = self._fields[0]
+        bound = Q(**{
+            f'{name}__{"lte" if descending == forward else "gte"}': key[0]})
+        condition = Q()
+        for position, (name, descending) in enumerate(self._fields):
+            lookup = 'lt' if descending == forward else 'gt'
+            equal = {
+                prev_name: key[index]
+                for index, (prev_name, _) in enumerate(
+                    self._fields[:position])
+            }
+            condition |= Q(**equal, **{f'{name}__{lookup}': key[position]})
+        return bound & condition
+
+    def _reversed_ordering(self) -> Tuple[str, ...]:
+        return tuple(
+            name if descending else f'-{name}'
+            for name, descending in self._fields
+        )
+
+    def _forward_page(self, key: Optional[List[Any]]) -> KeysetPage:
+        queryset = self.object_list.order_by(*self.ordering)
+        if key is not None:
+            queryset = queryset.filter(self._seek(key, forward=True))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = (
+            self.encode_cursor(FORWARD, rows[-1]) if has_more else None)
+        previous_cursor = (
+            self.encode_cursor(BACKWARD, rows[0])
+            if key is not None and rows else None)
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+    def _backward_page(self, key: List[Any]) -> KeysetPage:
+        queryset = self.object_list.order_by(
+            *self._reversed_ordering()).filter(self._seek(key, forward=False))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        previous_cursor = (
+            self.encode_cursor(BACKWARD, rows[0]) if has_more else None)
+        next_cursor = self.encode_cursor(FORWARD, rows[-1]) if rows else None
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
@@ -0,0 +1,212 @@
+"""Очередь фоновых задач в базе данных.
+
+Функция объявляется задачей декоратором task и ставится в очередь
+вызовом .delay(*args, **kwargs): в таблицу core_task пишется строка
+с именем функции и аргументами в JSON, поэтому аргументы - id
+и строки, а не объекты моделей. Строка пишется в текущей транзакции
+и видна исполнителям только после её фиксации.
+
+Исполнителей запускает команда run_tasks. Задачи забираются
+по приоритету (меньше - раньше) и сроку условным UPDATE, поэтому
+два процесса не возьмут одну задачу. Упавшая задача повторяется
+через TASKS_RETRY_DELAY * 2 ** (попытка - 1) секунд, пока не исчерпает
+max_attempts. Пока задача выполняется, исполнитель раз в треть
+TASKS_LOCK_TIMEOUT обновляет её locked_at; задача умершего исполнителя
+возвращается в очередь через TASKS_LOCK_TIMEOUT секунд. Результат
+записывается, только если задачу не перехватили: строка сверяется
+по исполнителю и номеру попытки.
+
+При TASKS_EAGER (разработка и тесты) задача выполняется сразу
+в процессе вызова."""
+import json
+import logging
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from importlib import import_module
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, QuerySet
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# Сколько задач из головы очереди пробует забрать исполнитель: если
+# первую перехватил другой процесс, берётся следующая.
+CLAIM_BATCH: int = 10
+
+_registry: Dict[str, 'TaskFunction'] = {}
+
+
+class TaskFunction:
+    """Функция-задача: вызывается как обычно или ставится в очередь."""
+
+    def __init__(self, func: Callable, priority: int,
+                 max_attempts: int) -> None:
+        self.func = func
+        self.name: str = f'{func.__module__}.{func.__qualname__}'
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs) -> Optional[Task]:
+        return self.schedule(args, kwargs)
+
+    def schedule(self, args: Sequence = (), kwargs: Optional[dict] = None,
+                 priority: Optional[int] = None,
+                 countdown: float = 0) -> Optional[Task]:
+        """Ставит задачу в очередь; при TASKS_EAGER выполняет сразу."""
+        arguments = json.dumps([list(args), kwargs or {}])
+        if settings.TASKS_EAGER:
+            # Аргументы проходят через JSON и здесь, чтобы ошибка
+            # сериализации была видна при разработке.
+            args, kwargs = json.loads(arguments)
+            self.func(*args, **kwargs)
+            return None
+        return Task.objects.create(
+            name=self.name,
+            arguments=arguments,
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            run_after=timezone.now() + timedelta(seconds=countdown),
+        )
+
+
+def task(priority: int = Task.PRIORITY_NORMAL,
+         max_attempts: int = 3) -> Callable[[Callable], TaskFunction]:
+    """Объявляет функцию фоновой задачей.
+
+    @task(priority=Task.PRIORITY_HIGH)
+    def delete_post(post_id): ...
+
+    delete_post.delay(post.pk)"""
+    def decorator(func: Callable) -> TaskFunction:
+        task_function = TaskFunction(func, priority, max_attempts)
+        _registry[task_function.name] = task_function
+        return task_function
+    return decorator
+
+
+def get_task(name: str) -> TaskFunction:
+    """Задача по имени; модуль задачи импортируется при первом вызове."""
+    if name not in _registry:
+        import_module(name.rsplit('.', 1)[0])
+    return _registry[name]
+
+
+def claim(worker: str) -> Optional[Task]:
+    """Забирает первую задачу очереди, срок которой наступил."""
+    now = timezone.now()
+    candidates = list(Task.objects.filter(
+        status=Task.QUEUED, run_after__lte=now,
+    ).order_by('priority', 'run_after', 'id').values_list(
+        'pk', flat=True)[:CLAIM_BATCH])
+    for pk in candidates:
+        claimed = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_by=worker, locked_at=now,
+            attempts=F('attempts') + 1)
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def _owned(task_row: Task) -> QuerySet:
+    """Строка задачи, если её не перехватил другой исполнитель."""
+    return Task.objects.filter(
+        pk=task_row.pk, status=Task.RUNNING,
+        locked_by=task_row.locked_by, attempts=task_row.attempts)
+
+
+def touch(task_row: Task) -> bool:
+    """Продлевает блокировку задачи; False - задачу уже перехватили."""
+    return bool(_owned(task_row).update(locked_at=timezone.now()))
+
+
+@contextmanager
+def heartbeat(task_row: Task) -> Iterator[None]:
+    """Продлевает блокировку, пока выполняется тело with,
+    чтобы requeue_stale не отдал долгую задачу другому исполнителю."""
+    stop = threading.Event()
+
+    def beat() -> None:
+        try:
+            while not stop.wait(settings.TASKS_LOCK_TIMEOUT / 3):
+                try:
+                    if not touch(task_row):
+                        return
+                except Exception:
+                    logger.exception('Не продлена блокировка %s', task_row)
+        finally:
+            # У потока своё соединение с базой.
+            connection.close()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def execute(task_row: Task) -> bool:
+    """Выполняет забранную задачу: удаляет её или планирует повтор."""
+    try:
+        args, kwargs = json.loads(task_row.arguments)
+        with heartbeat(task_row):
+            get_task(task_row.name).func(*args, **kwargs)
+    except Exception:
+        logger.exception('Задача %s не выполнена', task_row)
+        error = traceback.format_exc()
+        if task_row.attempts < task_row.max_attempts:
+            delay = settings.TASKS_RETRY_DELAY * 2 ** (task_row.attempts - 1)
+            _owned(task_row).update(
+                status=Task.QUEUED, locked_by='', last_error=error,
+                run_after=timezone.now() + timedelta(seconds=delay))
+        else:
+            _owned(task_row).update(
+                status=Task.FAILED, locked_by='', last_error=error)
+        return False
+    _owned(task_row).delete()
+    return True
+
+
+def requeue_stale() -> int:
+    """Возвращает в очередь задачи исполнителей, не завершивших их
+    за TASKS_LOCK_TIMEOUT секунд."""
+    now = timezone.now()
+    stale = Task.objects.filter(
+        status=Task.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT))
+    error = 'Исполнитель не завершил задачу'
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED, locked_by='', last_error=error)
+    return stale.update(
+        status=Task.QUEUED, locked_by='', last_error=error, run_after=now)
+
+
+def work(worker: str, burst: bool = False) -> int:
+    """Цикл исполнителя. burst - выйти, когда очередь опустеет.
+
+    Возвращает число выполненных задач."""
+    done = 0
+    while True:
+        close_old_connections()
+        task_row = claim(worker)
+        if task_row is None:
+            if requeue_stale():
+                continue
+            if burst:
+                return done
+            time.sleep(settings.TASKS_POLL_INTERVAL)
+            continue
+        done += execute(task_row)
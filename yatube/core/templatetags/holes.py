@@ -0,0 +1,20 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import holes
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name: str, **kwargs) -> str:
+    """Фрагмент, зависящий от зрителя (core.holes).
+
+    {% hole 'posts/includes/follow_button.html' author_id=author.pk %}
+
+    Рисуется как {% include %} с аргументами, но в метках, по которым
+    HolePunchMiddleware строит общую для всех зрителей оболочку."""
+    fragment = context.template.engine.get_template(template_name)
+    with context.push(**kwargs):
+        html = fragment.render(context)
+    return mark_safe(holes.wrap(template_name, kwargs, html))
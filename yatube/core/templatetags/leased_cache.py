@@ -0,0 +1,41 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core.cache import get_or_build
+
+register = template.Library()
+
+
+class LeasedCacheNode(template.Node):
+    def __init__(self, nodelist, expire_time, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context) -> str:
+        expire_time = self.expire_time.resolve(context)
+        key = make_template_fragment_key(
+            self.fragment_name, [var.resolve(context) for var in self.vary_on])
+        return get_or_build(
+            key, lambda: self.nodelist.render(context),
+            None if expire_time is None else int(expire_time))
+
+
+@register.tag
+def leasedcache(parser, token):
+    """{% cache %}, при промахе которого фрагмент рисует один процесс
+       (core.cache.get_or_build).
+
+    {% leasedcache [expire_time] [fragment_name] [var1] .. %}
+        ...
+    {% endleasedcache %}"""
+    nodelist = parser.parse(('endleasedcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} требует хотя бы 2 аргумента.')
+    return LeasedCacheNode(
+        nodelist, parser.compile_filter(tokens[1]), tokens[2],
+        [parser.compile_filter(name) for name in tokens[3:]])
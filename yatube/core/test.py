@@ -0,0 +1,56 @@
+from typing import Dict
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404
+
+from .budgets import QueryBudgetExceeded, check_budget
+
+
+class BudgetClient(Client):
+    """Тестовый клиент, который проверяет бюджет запросов представления.
+
+    При превышении бюджета (core.budgets) падает с перечнем запросов."""
+
+    def request(self, **request):
+        with CaptureQueriesContext(connection) as context:
+            response = super().request(**request)
+        try:
+            match = response.resolver_match
+            view, view_name = match.func, match.view_name
+        except Resolver404:
+            return response
+        error = check_budget(view, len(context.captured_queries), view_name)
+        if error:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}' for number, query in
+                enumerate(context.captured_queries, start=1))
+            raise QueryBudgetExceeded(f'{error}:\n{queries}')
+        return response
+
+
+class UsersTestCase(TestCase):
+    """Тест с пользователями и чистым кэшем.
+
+    users - атрибуты класса и имена пользователей, которые создаются
+    один раз на класс. Перед каждым тестом кэш очищается, а для каждого
+    пользователя создаётся вошедший клиент <атрибут>_client того же
+    класса client_class, что и гостевой self.client."""
+    users: Dict[str, str] = {}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        for attr, username in cls.users.items():
+            setattr(cls, attr,
+                    get_user_model().objects.create(username=username))
+
+    def setUp(self) -> None:
+        cache.clear()
+        for attr in self.users:
+            client = self.client_class()
+            client.force_login(getattr(self, attr))
+            setattr(self, f'{attr}_client', client)
@@ -0,0 +1,76 @@
+from core.test import UsersTestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.admin import PostAdmin
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class LargeTableAdminTest(UsersTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        cls.group = Group.objects.create(
+            title='admin_group', slug='admin_group', description='group')
+        cls.url = reverse('admin:posts_post_changelist')
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def create_posts(self, count: int) -> None:
+        start = User.objects.count()
+        User.objects.bulk_create([
+            User(username=f'author{start + i}') for i in range(count)])
+        Post.objects.bulk_create([
+            Post(text=str(i), author=author, group=self.group)
+            for i, author in enumerate(User.objects.filter(
+                username__startswith='author', posts__isnull=True))])
+
+    def test_changelist_queries_do_not_grow(self):
+        """Авторы и группы выбираются одним JOIN, без полного COUNT(*)."""
+        self.create_posts(2)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url)
+        self.create_posts(20)
+        cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(large), len(small))
+
+    @override_settings(ADMIN_COUNT_LIMIT=PostAdmin.list_per_page + 5)
+    def test_changelist_keyset_pages(self):
+        """Список листается по курсору, число записей ограничено."""
+        self.create_posts(PostAdmin.list_per_page + 10)
+        response = self.client.get(self.url)
+        changelist = response.context['cl']
+        self.assertContains(response, f'более {PostAdmin.list_per_page + 5}')
+        self.assertEqual(
+            list(changelist.result_list),
+            list(Post.objects.order_by('-created', '-id')[
+                :PostAdmin.list_per_page]))
+        response = self.client.get(self.url + changelist.next_page_url)
+        self.assertEqual(len(response.context['cl'].result_list), 10)
+        self.assertFalse(response.context['cl'].keyset_page.has_next())
+        response = self.client.get(self.url, {'p': 1})
+        self.assertIsNone(response.context['cl'].keyset_page)
+        self.assertEqual(len(response.context['cl'].result_list), 10)
+
+    def test_other_changelists(self):
+        author = User.objects.create(username='other_author')
+        post = Post.objects.create(text='post', author=author)
+        Comment.objects.create(text='comment', author=author, post=post)
+        Follow.objects.create(user=self.admin, author=author)
+        for model in ('comment', 'follow', 'group'):
+            with self.subTest(model=model):
+                response = self.client.get(
+                    reverse(f'admin:posts_{model}_changelist'))
+                self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            reverse('admin:posts_group_autocomplete'), {'term': 'admin'})
+        self.assertContains(response, 'admin_group')
@@ -0,0 +1,184 @@
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from core import holes
+from core.cache import LEASE_KEY, TieredCache, get_or_build
+from core.test import UsersTestCase
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Follow, Post, User
+
+
+class TieredCacheTest(TestCase):
+    def setUp(self) -> None:
+        self.shared_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.shared_dir, ignore_errors=True)
+        shared = FileBasedCache(self.shared_dir, {})
+        # Два процесса с общим L2 на файлах.
+        self.first, self.second = (
+            TieredCache('', {'OPTIONS': {
+                'L1_MAX_ENTRIES': 3, 'L1_TIMEOUT': 5}})
+            for _ in range(2))
+        self.first.shared = self.second.shared = shared
+
+    def test_writes_keep_other_local_copies(self):
+        self.first.set('key', 1)
+        self.assertEqual(self.second.get('key'), 1)
+        self.first.set('key', 2)
+        self.first.set('fragment', 'html')
+        self.first.delete('fragment')
+        self.assertEqual(self.first.get('key'), 2)
+        # Копия другого процесса живёт до L1_TIMEOUT.
+        self.assertEqual(self.second.get('key'), 1)
+        with mock.patch('core.cache.time.monotonic',
+                        return_value=time.monotonic() + 6):
+            self.assertEqual(self.second.get('key'), 2)
+
+    def test_generations_skip_local(self):
+        self.first.set('generation:index', 1)
+        self.assertEqual(self.second.get('generation:index'), 1)
+        self.first.set_many({'generation:index': 2})
+        self.assertEqual(self.second.get_many(['generation:index']),
+                         {'generation:index': 2})
+        self.assertEqual(list(self.second._local), [])
+
+    def test_local_lru(self):
+        self.first.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.first.get('a')
+        self.first.set('d', 4)
+        self.assertEqual(list(self.first._local), [
+            self.first._local_key(key, None) for key in ('c', 'a', 'd')])
+        self.assertEqual(self.first.get_many(['a', 'b', 'e']),
+                         {'a': 1, 'b': 2})
+
+    @override_settings(CACHE_LEASE_WAIT=0)
+    def test_get_or_build_lease(self):
+        build = mock.Mock(return_value='page')
+        self.assertEqual(
+            get_or_build('page', build, cache=self.first), 'page')
+        self.assertEqual(
+            get_or_build('page', build, cache=self.second), 'page')
+        build.assert_called_once()
+        # Аренду держит другой процесс: страница рисуется, но не пишется.
+        self.first.shared.add(LEASE_KEY % 'other', True)
+        self.assertEqual(
+            get_or_build('other', build, cache=self.second), 'page')
+        self.assertIsNone(self.second.get('other'))
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class AnonymousPageCacheTest(UsersTestCase):
+    users = {'author': 'page_cache_author'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            text='кэш страницы', author=cls.author, image='')
+
+    def test_anonymous_page_served_from_cache(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIsNotNone(response.context)
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertIsNone(response.context)
+                self.assertContains(response, 'кэш страницы')
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+        response = self.client.get(urls[0], {'page': 1})
+        self.assertIsNotNone(response.context)
+
+    def test_purged_on_change(self):
+        detail = reverse('posts:post_detail', args=[self.post.pk])
+        profile = reverse('posts:profile', args=[self.author.username])
+        self.client.get(detail)
+        self.client.get(profile)
+        Comment.objects.create(
+            text='новый комментарий', author=self.author, post=self.post)
+        self.assertContains(self.client.get(detail), 'новый комментарий')
+        Follow.objects.create(
+            user=User.objects.create(username='page_cache_reader'),
+            author=self.author)
+        self.assertContains(self.client.get(profile), 'Подписчиков: 1')
+
+    def test_logged_in_user_bypasses_cache(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = self.author_client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, self.author.username)
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class HolePunchTest(UsersTestCase):
+    users = {'author': 'shell_author', 'reader': 'shell_reader'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            text='оболочка', author=cls.author, image='')
+
+    def test_shell_shared_between_users(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.author_client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Редактировать запись')
+        self.assertNotContains(response, '<!--hole')
+        response = self.reader_client.get(url)
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertContains(response, 'оболочка')
+        self.assertContains(response, 'Пользователь: shell_reader')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'Редактировать запись')
+        self.assertNotContains(response, '<!--hole')
+        response = self.client.get(url)
+        self.assertContains(response, 'Войти')
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+
+    def test_shell_hit_answers_conditional_get(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        # Первый ответ ставит CSRF-cookie, от которой зависит ETag.
+        self.author_client.get(url)
+        response = self.author_client.get(url)
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertTemplateNotUsed(
+            response, 'posts/includes/post_actions.html')
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_anonymous_page_cached_from_shell(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.reader_client.get(url)
+        with mock.patch('core.holes.fill', wraps=holes.fill) as fill:
+            self.assertContains(self.client.get(url), 'оболочка')
+            with self.assertNumQueries(0):
+                self.assertContains(self.client.get(url), 'оболочка')
+        fill.assert_called_once()
+
+    def test_follow_button_filled_per_user(self):
+        url = reverse('posts:profile', args=[self.author.username])
+        response = self.author_client.get(url)
+        self.assertNotContains(response, 'Подписаться')
+        response = self.reader_client.get(url)
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'Подписаться shell_author')
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'Отписаться')
@@ -0,0 +1,51 @@
+from core.kvstore import KVStore
+from core.test import UsersTestCase
+from core.views import POSTS_ON_PAGE
+from django.test import override_settings
+from posts.thumbnails import thumbnail_file
+from sorl.thumbnail.images import serialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class ThumbnailKVStoreTest(UsersTestCase):
+    def test_prefetch_loads_page_in_one_query(self):
+        """Метаданные миниатюр страницы читаются одним запросом,
+           затем отдаются из памяти процесса."""
+        kvstore = KVStore()
+        names = [f'posts/{i}.jpg' for i in range(POSTS_ON_PAGE)]
+        files = [thumbnail_file(name, 'card') for name in names]
+        for image_file in files[1:]:
+            image_file.set_size((960, 339))
+            KVStoreModel.objects.create(
+                key=add_prefix(image_file.key),
+                value=serialize_image_file(image_file))
+        with self.assertNumQueries(1):
+            kvstore.prefetch(files)
+        with self.assertNumQueries(0):
+            self.assertIsNone(kvstore.get(files[0]))
+            for image_file in files[1:]:
+                self.assertEqual(
+                    kvstore.get(image_file).size, [960, 339])
+
+    def test_thumbnail_file_not_shared(self):
+        """Размер, записанный в файл миниатюры, не виден другим вызовам."""
+        image_file = thumbnail_file('posts/shared.jpg', 'card')
+        image_file.set_size((960, 339))
+        other = thumbnail_file('posts/shared.jpg', 'card')
+        self.assertEqual(other.name, image_file.name)
+        self.assertIsNone(other.size)
+
+    @override_settings(THUMBNAIL_MISS_TIMEOUT=0)
+    def test_missing_thumbnail_not_cached_for_long(self):
+        """Миниатюра, нарезанная другим процессом после промаха,
+           становится видна, когда промах истекает."""
+        kvstore = KVStore()
+        image_file = thumbnail_file('posts/late.jpg', 'card')
+        kvstore.prefetch([image_file])
+        self.assertIsNone(kvstore.get(image_file))
+        image_file.set_size((960, 339))
+        KVStoreModel.objects.create(
+            key=add_prefix(image_file.key),
+            value=serialize_image_file(image_file))
+        self.assertEqual(kvstore.get(image_file).size, [960, 339])
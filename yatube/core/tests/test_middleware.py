@@ -0,0 +1,79 @@
+import json
+from unittest import mock
+
+from core.budgets import QueryBudgetExceeded
+from core.test import BudgetClient, UsersTestCase
+from django.test import Client, override_settings
+from django.urls import reverse
+from posts.models import Comment, Post, User
+from posts.views import PostDetailView
+
+
+class RequestTimingMiddlewareTest(UsersTestCase):
+    users = {'author': 'timing_tester'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        Post.objects.create(text='timing', author=cls.author)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1.0)
+    def test_server_timing_and_log(self):
+        """Замеры запроса попадают в Server-Timing и в лог."""
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        for name in ('sql;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(name, header)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql_count'], 0)
+        self.assertIn(f'desc="{record["sql_count"]} queries"', header)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_disabled(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class QueryBudgetTest(UsersTestCase):
+    client_class = BudgetClient
+    users = {'author': 'budget_tester'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.post = Post.objects.create(text='budget', author=cls.author)
+        cls.url = reverse('posts:post_detail', args=[cls.post.pk])
+
+    def test_budget_does_not_grow_with_data(self):
+        """Число запросов страницы поста не зависит от комментариев."""
+        commenters = [User.objects.create(username=f'commenter{i}')
+                      for i in range(5)]
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=author, text='comment')
+            for author in commenters])
+        self.assertEqual(
+            self.author_client.get(self.url).status_code, 200)
+
+    def test_budget_exceeded(self):
+        with mock.patch.object(PostDetailView, 'query_budget', 1):
+            with self.assertRaisesMessage(
+                    QueryBudgetExceeded, 'posts:post_detail'):
+                self.author_client.get(self.url)
+
+    @override_settings(QUERY_BUDGET_ACTION='log')
+    def test_middleware_logs(self):
+        client = Client()
+        client.force_login(self.author)
+        with mock.patch.object(PostDetailView, 'query_budget', 1):
+            with self.assertLogs('core.budgets', 'WARNING') as logs:
+                self.assertEqual(client.get(self.url).status_code, 200)
+        self.assertIn('posts:post_detail', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_ACTION='raise')
+    def test_middleware_raises(self):
+        with mock.patch.object(PostDetailView, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                Client().get(self.url)
@@ -0,0 +1,151 @@
+from unittest import mock
+
+from core.pagination import ELLIPSIS, FeedPaginator, KeysetPaginator
+from core.test import UsersTestCase
+from core.views import POSTS_ON_PAGE
+from django.core.paginator import Page
+from django.http import Http404
+from django.test import override_settings
+from django.urls import reverse
+from posts import counters
+from posts.models import Post
+
+
+class FeedPaginatorTest(UsersTestCase):
+    users = {'author': 'feed_tester'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        Post.objects.bulk_create([
+            Post(text=str(i), author=cls.author) for i in range(100)])
+        counters.recount_all()
+
+    def test_elided_page_range(self):
+        paginator = FeedPaginator(range(100), 4)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(1)),
+            [1, 2, 3, 4, ELLIPSIS, 24, 25])
+        self.assertEqual(
+            list(paginator.get_elided_page_range(12)),
+            [1, 2, ELLIPSIS, 9, 10, 11, 12, 13, 14, 15, ELLIPSIS, 24, 25])
+        self.assertEqual(
+            list(paginator.get_elided_page_range(25)),
+            [1, 2, ELLIPSIS, 22, 23, 24, 25])
+        self.assertEqual(
+            list(FeedPaginator(range(20), 4).get_elided_page_range(3)),
+            [1, 2, 3, 4, 5])
+
+    def test_count_cached(self):
+        queryset = Post.objects.all()
+        self.assertEqual(FeedPaginator(queryset, 4, count_key='k').count, 100)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                FeedPaginator(queryset, 4, count_key='k').count, 100)
+        Post.objects.create(text='new', author=self.author)
+        with self.assertNumQueries(1):
+            self.assertEqual(FeedPaginator(
+                queryset, 4, count_key='k', count_stamp=2).count, 101)
+
+    @override_settings(FEED_COUNT_ASYNC=True)
+    def test_stale_count_refreshed_in_background(self):
+        queryset = Post.objects.all()
+        FeedPaginator(queryset, 4, count_key='k', count_stamp=1).count
+        with mock.patch('core.pagination.schedule_refresh') as refresh:
+            with self.assertNumQueries(0):
+                paginator = FeedPaginator(
+                    queryset, 4, count_key='k', count_stamp=2)
+                self.assertEqual(paginator.count, 100)
+        refresh.assert_called_once_with('k', 2, queryset, None)
+        # Номер страницы за пределами устаревшего числа допустим.
+        self.assertEqual(len(paginator.page(30)), 0)
+
+    def test_many_pages(self):
+        paginator = FeedPaginator(Post.objects.all(), 4, count_limit=10)
+        self.assertEqual(paginator.count, 11)
+        self.assertTrue(paginator.many_pages)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(8)),
+            [1, 2, ELLIPSIS, 5, 6, 7, 8, 9, 10, 11, ELLIPSIS])
+        page = paginator.page(8)
+        self.assertEqual(len(page), 4)
+        self.assertTrue(page.has_next())
+
+    def test_known_count(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(FeedPaginator(
+                Post.objects.all(), 4, known_count=7).num_pages, 2)
+
+    def test_feed_renders_window(self):
+        """Ссылок на страницы не больше окна, число постов в кэше
+           сбрасывается новым постом."""
+        url = reverse('posts:profile', args=[self.author.username])
+        response = self.client.get(url, {'page': 12})
+        self.assertIs(type(response.context['page_obj']), Page)
+        content = response.content.decode()
+        self.assertEqual(content.count('page=12'), 0)
+        self.assertEqual(content.count(ELLIPSIS), 2)
+        self.assertIn('page=11"', content)
+        self.assertNotIn('page=5"', content)
+        Post.objects.create(text='new', author=self.author)
+        response = self.client.get(url, {'page': 26})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['paginator'].count, 101)
+        # Счётчик постов автора точен: за последней страницей - 404.
+        response = self.client.get(url, {'page': 999})
+        self.assertEqual(response.status_code, 404)
+
+
+class KeysetPaginatorTest(UsersTestCase):
+    users = {'author': 'keyset_tester'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Создание постов с одинаковой датой для проверки курсора."""
+        super().setUpClass()
+        Post.objects.bulk_create([Post(
+            text=str(i),
+            author=cls.author
+        ) for i in range(POSTS_ON_PAGE * 2 + 1)])
+        Post.objects.update(created=Post.objects.first().created)
+        cls.expected = list(Post.objects.order_by('-created', '-id'))
+
+    def test_pages_follow_each_other(self):
+        """Страницы по курсору идут подряд без пропусков и повторов."""
+        paginator = KeysetPaginator(Post.objects.all(), POSTS_ON_PAGE)
+        page = paginator.page()
+        self.assertFalse(page.has_previous())
+        seen = list(page)
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(page), 1)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор назад возвращает ту же страницу, что и была."""
+        paginator = KeysetPaginator(Post.objects.all(), POSTS_ON_PAGE)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        back = paginator.page(second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertEqual(back.next_cursor, first.next_cursor)
+
+    def test_bad_cursor_raises_404(self):
+        """Подделанный курсор приводит к 404."""
+        paginator = KeysetPaginator(Post.objects.all(), POSTS_ON_PAGE)
+        with self.assertRaises(Http404):
+            paginator.page('forged')
+
+    @override_settings(FEED_KEYSET_PAGINATION=True)
+    def test_index_uses_cursor(self):
+        """Главная страница в режиме курсора."""
+        response = self.client.get(reverse('posts:index'))
+        page = response.context['page_obj']
+        self.assertTrue(page.is_keyset)
+        self.assertEqual(list(page), self.expected[:POSTS_ON_PAGE])
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': page.next_cursor})
+        self.assertEqual(
+            list(response.context['page_obj']),
+            self.expected[POSTS_ON_PAGE:POSTS_ON_PAGE * 2])
@@ -0,0 +1,100 @@
+import time
+from datetime import timedelta
+from io import StringIO
+
+from core import tasks
+from core.models import Task
+from core.tasks import task
+from core.test import UsersTestCase
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import Post
+
+
+@task(max_attempts=2)
+def failing_task(message: str) -> None:
+    raise ValueError(message)
+
+
+@override_settings(TASKS_EAGER=False)
+class TasksTest(UsersTestCase):
+    users = {'author': 'tasks_author'}
+
+    def test_post_delete_is_queued(self):
+        post = Post.objects.create(text='удалить', author=self.author,
+                                   image='')
+        self.author_client.get(reverse('posts:post_delete', args=[post.pk]))
+        self.assertTrue(Post.objects.filter(pk=post.pk).exists())
+        queued = Task.objects.get()
+        self.assertEqual(queued.name, 'posts.tasks.delete_post')
+        self.assertEqual(queued.priority, Task.PRIORITY_HIGH)
+        call_command('run_tasks', burst=True, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+        self.assertFalse(Task.objects.exists())
+
+    def test_priority_order(self):
+        low = failing_task.schedule(['low'], priority=Task.PRIORITY_LOW)
+        high = failing_task.schedule(['high'], priority=Task.PRIORITY_HIGH)
+        self.assertEqual(tasks.claim('test'), high)
+        self.assertEqual(tasks.claim('test'), low)
+        self.assertIsNone(tasks.claim('test'))
+
+    def test_retry_with_backoff_then_fail(self):
+        queued = failing_task.delay('ошибка')
+        self.assertEqual(tasks.work('test', burst=True), 0)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn('ValueError: ошибка', queued.last_error)
+        self.assertGreater(queued.run_after, timezone.now())
+        Task.objects.update(run_after=timezone.now())
+        tasks.work('test', burst=True)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+    def test_stale_task_requeued(self):
+        queued = failing_task.delay('зависла')
+        tasks.claim('dead')
+        Task.objects.update(locked_at=timezone.now() - timedelta(
+            seconds=settings.TASKS_LOCK_TIMEOUT + 1))
+        self.assertEqual(tasks.requeue_stale(), 1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertEqual(queued.locked_by, '')
+
+    def test_requeued_task_not_finished_by_old_worker(self):
+        queued = failing_task.delay('долгая')
+        slow = tasks.claim('slow')
+        Task.objects.update(locked_at=timezone.now() - timedelta(
+            seconds=settings.TASKS_LOCK_TIMEOUT + 1))
+        tasks.requeue_stale()
+        fresh = tasks.claim('fresh')
+        self.assertFalse(tasks.execute(slow))
+        self.assertFalse(tasks.touch(slow))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.RUNNING)
+        self.assertEqual(queued.locked_by, 'fresh')
+        self.assertEqual(queued.last_error, 'Исполнитель не завершил задачу')
+        self.assertTrue(tasks.touch(fresh))
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_runs_inline(self):
+        with self.assertRaises(ValueError):
+            failing_task.delay('сразу')
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(TASKS_EAGER=False, TASKS_LOCK_TIMEOUT=0.03)
+class TaskHeartbeatTest(TransactionTestCase):
+    # Пульс пишет из своего потока и соединения, поэтому строка задачи
+    # должна быть зафиксирована, а не ждать в транзакции TestCase.
+    def test_heartbeat_extends_lock(self):
+        failing_task.delay('долгая')
+        running = tasks.claim('test')
+        with tasks.heartbeat(running):
+            time.sleep(0.1)
+        self.assertGreater(Task.objects.get().locked_at, running.locked_at)
@@ -0,0 +1,50 @@
+"""Замеры времени текущего запроса (см. core.middleware).
+
+Код приложения отмечает интересные участки через measure(): если запрос
+не попал в выборку, measure() стоит одного чтения contextvar."""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+
+class RequestTimings:
+    """Счётчики одного запроса, длительности в секундах."""
+
+    def __init__(self) -> None:
+        self.started: float = time.perf_counter()
+        self.sql_count: int = 0
+        self.sql_time: float = 0.0
+        self.spans: Dict[str, float] = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка connection.execute_wrapper: время SQL-запросов."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.sql_count += 1
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+
+current: ContextVar[Optional[RequestTimings]] = ContextVar(
+    'request_timings', default=None)
+
+
+@contextmanager
+def measure(name: str) -> Iterator[None]:
+    """Добавляет время блока к участку name текущего запроса."""
+    timings = current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.spans[name] += time.perf_counter() - start
@@ -0,0 +1,62 @@
+"""HTTP-валидаторы страниц по поколениям (core.generations).
+
+ETag зависит от адреса с параметрами, от зрителя (id пользователя
+из сессии и CSRF-cookie формы) и от поколений областей страницы.
+Last-Modified - самое позднее из поколений; он не различает зрителей
+и точен до секунды, поэтому отдаётся только анонимным посетителям
+и только когда с последнего изменения прошла целая секунда, иначе
+клиент сверяет один ETag.
+
+Одни и те же валидаторы строят core.views.ConditionalGetMixin
+и HolePunchMiddleware, отдающий страницу из оболочки."""
+import hashlib
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+ANONYMOUS: str = 'anonymous'
+
+
+def viewer_key(request) -> str:
+    # Пользователь берётся из сессии, а не из request.user,
+    # чтобы не загружать его ради ответа 304.
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is None:
+        return ANONYMOUS
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return f'{user_id}:{csrf}'
+
+
+def page_validators(request, generations: Dict[str, int],
+                    viewer: Optional[str] = None
+                    ) -> Tuple[str, Optional[int]]:
+    """ETag (в кавычках) и Last-Modified страницы или None вместо даты."""
+    if viewer is None:
+        viewer = viewer_key(request)
+    source = '|'.join((
+        request.get_full_path(),
+        viewer,
+        *(f'{scope}={generations[scope]}' for scope in sorted(generations)),
+    ))
+    etag = quote_etag(hashlib.md5(source.encode()).hexdigest())
+    last_modified = max(generations.values()) // 1000000
+    if viewer != ANONYMOUS or last_modified >= int(time.time()):
+        # Вход и выход не меняют дату, правка в ту же секунду - тоже:
+        # по такой дате клиент получил бы устаревшую страницу.
+        last_modified = None
+    return etag, last_modified
+
+
+def patch_validators(request, response, etag: str,
+                     last_modified: Optional[int]) -> None:
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Браузер хранит страницу, но перед показом сверяет валидаторы.
+    patch_cache_control(response, no_cache=True)
+    if request.session.get(SESSION_KEY) is not None:
+        patch_cache_control(response, private=True)
@@ -1,10 +1,19 @@
-from typing import Optional
+from typing import Hashable, List, Optional, Tuple
 
+from django.conf import settings
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
 from django.views.generic import ListView
 from posts.models import Post
+from posts.recent import PostList
+
+from . import validators
+from .generations import GLOBAL_SCOPE, generation_key, get_generations
+from .pagination import FeedPaginator, KeysetPaginator
 
 POSTS_ON_PAGE: int = 4
+COMMENTS_ON_PAGE: int = 20
 
 
 def page_not_found(request, exception):
@@ -19,7 +28,155 @@ def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
 
 
-class PostsListView(ListView):
+class ConditionalGetMixin:
+    """Ответ 304 Not Modified на повторный запрос неизменившейся страницы.
+
+    Валидаторы (core.validators) строятся из поколений областей
+    страницы (core.generations): поколение - момент последнего
+    изменения её постов и комментариев. Проверка выполняется
+    в dispatch() до выборки постов и отрисовки шаблона."""
+
+    def get_validator_scopes(self) -> List[str]:
+        """Области, от которых зависит страница; пусто - без проверки."""
+        return []
+
+    def get_viewer_key(self) -> str:
+        return validators.viewer_key(self.request)
+
+    def get_validators(self) -> Optional[Tuple[str, Optional[int]]]:
+        scopes = self.get_validator_scopes()
+        if not scopes:
+            return None
+        generations = get_generations(GLOBAL_SCOPE, *scopes)
+        # Суррогатные ключи страницы для AnonymousPageCacheMiddleware.
+        self.request.page_generations = generations
+        return validators.page_validators(
+            self.request, generations, self.get_viewer_key())
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        page_validators = self.get_validators()
+        if page_validators is None:
+            return super().dispatch(request, *args, **kwargs)
+        etag, last_modified = page_validators
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            validators.patch_validators(
+                request, response, etag, last_modified)
+        return response
+
+
+class PostsListView(ConditionalGetMixin, ListView):
     model = Post
     paginate_by: int = POSTS_ON_PAGE
+    paginator_class = FeedPaginator
     context_object_name: Optional[str] = 'posts'
+    # None - режим берётся из settings.FEED_KEYSET_PAGINATION.
+    keyset_pagination: Optional[bool] = None
+    keyset_ordering = ('-created', '-id')
+    # Область кэша отрисованной ленты, None - лента не кэшируется.
+    feed_scope: Optional[str] = None
+    # Предел SQL-запросов на страницу (core.budgets), None - без проверки.
+    query_budget: Optional[int] = None
+
+    def get_feed_scope(self) -> Optional[str]:
+        return self.feed_scope
+
+    def get_validator_scopes(self) -> List[str]:
+        scope = self.get_feed_scope()
+        return [scope] if scope else []
+
+    @cached_property
+    def feed_generation(self) -> Optional[str]:
+        scope = self.get_feed_scope()
+        if not scope:
+            return None
+        return generation_key(GLOBAL_SCOPE, scope)
+
+    def get_count_key(self) -> Tuple[Optional[str], Hashable]:
+        """Ключ кэша числа постов ленты и отметка его свежести."""
+        return self.get_feed_scope(), self.feed_generation
+
+    def get_known_count(self) -> Optional[int]:
+        """Число постов из денормализованного счётчика, если он есть."""
+        return None
+
+    def get_paginator(self, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True, **kwargs):
+        count_key, count_stamp = self.get_count_key()
+        kwargs.update(
+            count_key=count_key,
+            count_stamp=count_stamp,
+            known_count=self.get_known_count(),
+            count_limit=settings.FEED_COUNT_LIMIT,
+        )
+        return super().get_paginator(
+            queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        scope = self.get_feed_scope()
+        if scope:
+            # Поколение читается до выборки постов: изменение, случившееся
+            # во время отрисовки, не попадёт в кэш под новым поколением.
+            kwargs.update(
+                feed_scope=scope,
+                feed_generation=self.feed_generation,
+                feed_cache_time=settings.FEED_CACHE_TIME,
+            )
+        context = super().get_context_data(**kwargs)
+        # Параметры запроса (например, строка поиска) сохраняются
+        # в ссылках пагинатора.
+        params = self.request.GET.copy()
+        params.pop(self.page_kwarg, None)
+        params.pop('cursor', None)
+        context['page_params'] = params.urlencode() + '&' if params else ''
+        paginator = context.get('paginator')
+        if isinstance(paginator, FeedPaginator):
+            context['elided_page_range'] = paginator.get_elided_page_range(
+                context['page_obj'].number)
+        return context
+
+    def uses_keyset_pagination(self) -> bool:
+        if self.keyset_pagination is None:
+            return settings.FEED_KEYSET_PAGINATION
+        return self.keyset_pagination
+
+    def get_recent_posts(self, offset: int,
+                         limit: int) -> Optional[PostList]:
+        """Посты страницы из кэша последних постов (posts.recent)
+        или None, если страница в нём не помещается."""
+        return None
+
+    def paginate_recent(self, queryset, page_size):
+        if not settings.RECENT_POSTS_ENABLED:
+            return None
+        try:
+            number = int(self.request.GET.get(self.page_kwarg) or 1)
+        except ValueError:
+            return None
+        offset = (number - 1) * page_size
+        if number < 1 or offset + page_size > settings.RECENT_POSTS_LENGTH:
+            return None
+        posts = self.get_recent_posts(offset, page_size)
+        # ids, а не len(posts): длина загрузила бы посты, а страница
+        # может быть закэширована целиком.
+        if posts is None or (number > 1 and not posts.ids):
+            return None
+        paginator = self.get_paginator(
+            queryset, page_size, orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty())
+        page = paginator._get_page(posts, number, paginator)
+        return paginator, page, posts, page.has_other_pages()
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.uses_keyset_pagination():
+            return (self.paginate_recent(queryset, page_size)
+                    or super().paginate_queryset(queryset, page_size))
+        paginator = KeysetPaginator(
+            queryset, page_size, ordering=self.keyset_ordering)
+        page = paginator.page(self.request.GET.get(paginator.cursor_param))
+        return paginator, page, page.object_list, page.has_other_pages()
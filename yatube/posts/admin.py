@@ -1,25 +1,50 @@
 from typing import Tuple
 
+from core.admin import LargeTableAdmin
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdmin):
     list_display: Tuple[str, ...] = (
         'pk',
         'text',
         'created',
+        'updated',
         'author',
         'group'
     )
-    list_editable: Tuple[str, ...] = ('group',)
+    list_select_related: Tuple[str, ...] = ('author', 'group')
+    raw_id_fields: Tuple[str, ...] = ('author',)
+    autocomplete_fields: Tuple[str, ...] = ('group',)
     search_fields: Tuple[str, ...] = ('text',)
     list_filter: Tuple[str, ...] = ('created',)
     empty_value_display: str = '-пусто-'
 
 
+class GroupAdmin(admin.ModelAdmin):
+    list_display: Tuple[str, ...] = ('pk', 'title', 'slug')
+    ordering: Tuple[str, ...] = ('title',)
+    search_fields: Tuple[str, ...] = ('title', 'slug')
+
+
+class CommentAdmin(LargeTableAdmin):
+    list_display: Tuple[str, ...] = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related: Tuple[str, ...] = ('author', 'post')
+    raw_id_fields: Tuple[str, ...] = ('author', 'post')
+    search_fields: Tuple[str, ...] = ('text',)
+
+
+class FollowAdmin(LargeTableAdmin):
+    list_display: Tuple[str, ...] = ('pk', 'user', 'author')
+    list_select_related: Tuple[str, ...] = ('user', 'author')
+    raw_id_fields: Tuple[str, ...] = ('user', 'author')
+    # У подписок нет даты: курсор идёт по первичному ключу.
+    keyset_ordering = ('-id',)
+
+
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
-admin.site.register(Follow)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
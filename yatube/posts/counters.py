@@ -0,0 +1,68 @@
+"""Денормализованные счётчики постов и подписок (AuthorStats)."""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+
+def change(user_id: int, **deltas: int) -> None:
+    """Сдвигает счётчики пользователя на заданные величины.
+
+    Если строки счётчиков ещё нет (пользователь создан в обход
+    сигналов), при увеличении она создаётся пересчётом. При уменьшении
+    отсутствующая строка не создаётся: пользователь мог удаляться.
+    Счётчик, разошедшийся с данными (bulk_create в обход сигналов),
+    не уходит ниже нуля."""
+    updated = AuthorStats.objects.filter(user_id=user_id).update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        recount(user_id)
+
+
+def recount(user_id: int) -> AuthorStats:
+    """Пересчитывает счётчики одного пользователя."""
+    stats, _ = AuthorStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id).count(),
+        }
+    )
+    return stats
+
+
+def change_comments(post_id: int, delta: int) -> None:
+    """Сдвигает счётчик комментариев поста."""
+    Post.objects.filter(pk=post_id).update(
+        comments_count=Greatest(F('comments_count') + delta, 0))
+
+
+def _count_subquery(queryset, field: str) -> Coalesce:
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('user_id')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def recount_all() -> int:
+    """Пересчитывает счётчики всех пользователей и постов."""
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id) for user_id in User.objects.filter(
+            stats__isnull=True).values_list('pk', flat=True)],
+        batch_size=500, ignore_conflicts=True)
+    Post.objects.update(comments_count=Coalesce(Subquery(
+        Comment.objects.filter(post_id=OuterRef('pk')).order_by().values(
+            'post_id').annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0))
+    return AuthorStats.objects.update(
+        posts_count=_count_subquery(Post.objects.all(), 'author_id'),
+        followers_count=_count_subquery(Follow.objects.all(), 'author_id'),
+        following_count=_count_subquery(Follow.objects.all(), 'user_id'),
+    )
@@ -0,0 +1,31 @@
+"""Поставщики контекста фрагментов-«дырок» (core.holes) приложения posts.
+
+Вызываются, когда фрагмент дорисовывается в закэшированную оболочку
+страницы, и возвращают то, что при полной отрисовке брал бы
+из контекста представления."""
+from typing import Any, Dict
+
+from django.urls import reverse
+
+from core.holes import provides
+
+from .forms import CommentForm
+from .models import Follow
+from .views import PostDetailView
+
+
+@provides('posts/includes/follow_button.html')
+def follow_button(request, author_id: int, **kwargs) -> Dict[str, Any]:
+    if not request.user.is_authenticated:
+        return {}
+    return {'following': Follow.objects.filter(
+        user_id=request.user.pk, author_id=author_id).exists()}
+
+
+@provides('posts/includes/comment_form.html')
+def comment_form(request, post_id: int, **kwargs) -> Dict[str, Any]:
+    return {
+        **PostDetailView.extra_context,
+        'form': CommentForm(),
+        'action': reverse('posts:add_comment', args=(post_id,)),
+    }
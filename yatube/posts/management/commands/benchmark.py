@@ -0,0 +1,151 @@
+import json
+import math
+import time
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+from posts.urls import app_name, urlpatterns
+
+# Адреса, которые меняют данные даже по GET, не замеряются.
+SKIPPED: Dict[str, str] = {
+    'post_delete': 'удаляет пост',
+    'add_comment': 'только POST',
+    'profile_follow': 'создаёт подписку',
+    'profile_unfollow': 'удаляет подписку',
+}
+# Страницы, которые осмысленно открывать только автору поста.
+AS_AUTHOR = {'post_edit'}
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Процентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа и число SQL-запросов для каждого '
+            'адреса posts.urls на текущей базе (см. generate_data).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=20,
+            help='Число замеров на адрес.')
+        parser.add_argument(
+            '--warmup', type=int, default=2,
+            help='Запросы перед замером (прогрев кэшей).')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.')
+        parser.add_argument(
+            '--url', action='append', dest='urls', default=None,
+            help='Замерять только эти имена адресов.')
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Вывести результаты в JSON.')
+
+    def sample_kwargs(self) -> Dict[str, object]:
+        """Аргументы адресов: самые «тяжёлые» объекты базы."""
+        post = Post.objects.order_by('-comments_count', '-pk').first()
+        group = Group.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        author = User.objects.order_by(
+            '-stats__posts_count', 'pk').first()
+        if post is None or group is None or author is None:
+            raise CommandError(
+                'Нет данных для замера, сначала выполните generate_data')
+        return {
+            'post_id': post.pk,
+            'group_slug': group.slug,
+            'username': author.username,
+        }
+
+    def clients(self, post_id: int) -> Dict[str, Client]:
+        reader = User.objects.filter(
+            pk__in=Follow.objects.values('user_id')
+        ).order_by('-stats__following_count', 'pk').first()
+        author = Post.objects.select_related('author').get(pk=post_id).author
+        clients = {'guest': Client(SERVER_NAME='localhost')}
+        for name, user in (('auth', reader), ('author', author)):
+            if user is not None:
+                clients[name] = Client(SERVER_NAME='localhost')
+                clients[name].force_login(user)
+        return clients
+
+    def measure(self, client: Client, url: str, options) -> dict:
+        timings: List[float] = []
+        queries: List[int] = []
+        status: Optional[int] = None
+        for number in range(options['warmup'] + options['requests']):
+            if options['cold']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                status = client.get(url).status_code
+                elapsed = time.perf_counter() - start
+            if number >= options['warmup']:
+                timings.append(elapsed * 1000)
+                queries.append(len(context.captured_queries))
+        return {
+            'status': status,
+            'p50': percentile(timings, 50),
+            'p95': percentile(timings, 95),
+            'p99': percentile(timings, 99),
+            'queries': max(queries),
+        }
+
+    def measure_pattern(self, pattern, kwargs: Dict[str, object],
+                        clients: Dict[str, Client], options) -> List[dict]:
+        """Замеры одного адреса для всех подходящих клиентов."""
+        name = pattern.name
+        if name in SKIPPED:
+            return [{'name': name, 'skipped': SKIPPED[name]}]
+        url = reverse(f'{app_name}:{name}', kwargs={
+            key: kwargs[key] for key in pattern.pattern.converters})
+        if name == 'search':
+            url += '?q=пост'
+        client_names = ['author'] if name in AS_AUTHOR else ['guest', 'auth']
+        return [
+            {'name': name, 'client': client_name, 'url': url,
+             **self.measure(clients[client_name], url, options)}
+            for client_name in client_names if client_name in clients
+        ]
+
+    def report(self, results: List[dict]) -> None:
+        self.stdout.write(
+            f'{"адрес":<18}{"клиент":<8}{"код":>5}'
+            f'{"p50 мс":>9}{"p95 мс":>9}{"p99 мс":>9}{"SQL":>6}')
+        for row in results:
+            if 'skipped' in row:
+                self.stdout.write(
+                    f'{row["name"]:<18}пропущен: {row["skipped"]}')
+                continue
+            self.stdout.write(
+                f'{row["name"]:<18}{row["client"]:<8}{row["status"]:>5}'
+                f'{row["p50"]:>9.1f}{row["p95"]:>9.1f}{row["p99"]:>9.1f}'
+                f'{row["queries"]:>6}')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должно быть больше нуля')
+        kwargs = self.sample_kwargs()
+        clients = self.clients(kwargs['post_id'])
+        results = []
+        for pattern in urlpatterns:
+            if options['urls'] and pattern.name not in options['urls']:
+                continue
+            results.extend(
+                self.measure_pattern(pattern, kwargs, clients, options))
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False))
+            return
+        self.report(results)
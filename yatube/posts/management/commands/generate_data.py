@@ -0,0 +1,154 @@
+import random
+from datetime import timedelta
+from itertools import accumulate
+from typing import List
+
+from core.generations import GLOBAL_SCOPE, bump
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from posts import counters, recent, search, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+WORDS: List[str] = (
+    'пост текст кошка собака город лето зима море книга фильм музыка '
+    'работа друг утро вечер дорога поезд лес река чай кофе сад дом'
+).split()
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетические данные для нагрузочных замеров: '
+            'пользователей, группы, посты, комментарии и подписки '
+            'с распределением Парето (немногие авторы пишут и читаются '
+            'больше всех).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты постов.')
+        parser.add_argument(
+            '--skew', type=float, default=1.16,
+            help='Параметр alpha распределения Парето (1.16 - правило 80/20).')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Размер пачки вставки, по умолчанию - предел базы.')
+
+    def _weights(self, count: int) -> List[float]:
+        """Накопленные веса Парето для random.choices."""
+        return list(accumulate(
+            self.random.paretovariate(self.skew) for _ in range(count)))
+
+    def _text(self, low: int, high: int) -> str:
+        return ' '.join(
+            self.random.choices(WORDS, k=self.random.randint(low, high)))
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.skew = options['skew']
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            users = self.create_users(options['users'], batch_size)
+            groups = self.create_groups(options['groups'], batch_size)
+            posts = self.create_posts(
+                options['posts'], options['days'], users, groups, batch_size)
+            self.create_comments(options['comments'], users, posts, batch_size)
+            self.create_follows(options['follows'], users, batch_size)
+            # bulk_create не отправляет сигналы: производные данные
+            # пересчитываются целиком.
+            counters.recount_all()
+            timeline.rebuild()
+            search.get_backend().rebuild()
+        bump(GLOBAL_SCOPE)
+        recent.forget(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, групп {len(groups)}, '
+            f'постов {len(posts)}, комментариев {options["comments"]}, '
+            f'подписок до {options["follows"]}'))
+
+    def _new_ids(self, model, objects, batch_size: int) -> List[int]:
+        """Создаёт объекты и возвращает их id: SQLite не возвращает
+        первичные ключи из bulk_create."""
+        last_id = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        model.objects.bulk_create(objects, batch_size=batch_size)
+        return list(model.objects.filter(
+            pk__gt=last_id).order_by('pk').values_list('pk', flat=True))
+
+    def create_users(self, count: int, batch_size: int) -> List[int]:
+        start = (User.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        password = make_password(None)
+        return self._new_ids(User, (
+            User(username=f'user{number}', password=password)
+            for number in range(start, start + count)
+        ), batch_size)
+
+    def create_groups(self, count: int, batch_size: int) -> List[int]:
+        start = (Group.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        return self._new_ids(Group, (
+            Group(title=f'Группа {number}', slug=f'group-{number}',
+                  description=self._text(5, 20))
+            for number in range(start, start + count)
+        ), batch_size)
+
+    def create_posts(self, count: int, days: int, users: List[int],
+                     groups: List[int], batch_size: int) -> List[int]:
+        if not count or not users:
+            return []
+        authors = self.random.choices(
+            users, cum_weights=self._weights(len(users)), k=count)
+        group_weights = self._weights(len(groups)) if groups else None
+        posts = []
+        for author_id in authors:
+            group_id = None
+            if groups and self.random.random() < 0.7:
+                group_id = self.random.choices(
+                    groups, cum_weights=group_weights)[0]
+            posts.append(Post(author_id=author_id, group_id=group_id,
+                              text=self._text(10, 120)))
+        ids = self._new_ids(Post, posts, batch_size)
+        # created и updated заполняются auto_now, поэтому даты расставляются
+        # после вставки, по возрастанию id.
+        now = timezone.now()
+        offsets = sorted(
+            (self.random.uniform(0, days) for _ in ids), reverse=True)
+        Post.objects.bulk_update([
+            Post(pk=pk, created=now - timedelta(days=offset),
+                 updated=now - timedelta(days=offset))
+            for pk, offset in zip(ids, offsets)
+        ], ['created', 'updated'], batch_size=batch_size)
+        return ids
+
+    def create_comments(self, count: int, users: List[int],
+                        posts: List[int], batch_size: int) -> None:
+        if not count or not users or not posts:
+            return
+        # Свежие посты (с большими id) комментируют чаще.
+        post_weights = list(accumulate(
+            sorted(self.random.paretovariate(self.skew) for _ in posts)))
+        targets = self.random.choices(posts, cum_weights=post_weights, k=count)
+        Comment.objects.bulk_create((
+            Comment(post_id=post_id, author_id=self.random.choice(users),
+                    text=self._text(3, 40))
+            for post_id in targets
+        ), batch_size=batch_size)
+
+    def create_follows(self, count: int, users: List[int],
+                       batch_size: int) -> None:
+        if not count or len(users) < 2:
+            return
+        authors = self.random.choices(
+            users, cum_weights=self._weights(len(users)), k=count)
+        Follow.objects.bulk_create((
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in zip(
+                self.random.choices(users, k=count), authors)
+            if user_id != author_id
+        ), batch_size=batch_size, ignore_conflicts=True)
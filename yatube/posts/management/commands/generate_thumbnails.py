@@ -0,0 +1,22 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Нарезает миниатюры картинок постов, например загруженных '
+            'до появления фоновой нарезки.')
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').exclude(
+            image=thumbnails.DEFAULT_IMAGE).values_list(
+            'image', flat=True).distinct()
+        done = 0
+        for name in names.iterator():
+            if default_storage.exists(name):
+                thumbnails.generate(name)
+                done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Нарезаны миниатюры {done} картинок'))
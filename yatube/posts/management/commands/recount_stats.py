@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, подписчиков и подписок авторов.'
+
+    def handle(self, *args, **options):
+        updated = counters.recount_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитаны счётчики {updated} пользователей'))
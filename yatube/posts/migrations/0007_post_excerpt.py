@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:13
+
+import core.models
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def cut_at_word(text, length):
+    """Копия core.models.cut_at_word на момент миграции: миграция
+    не должна меняться вместе с кодом приложения."""
+    if len(text) <= length:
+        return text
+    head = text[:length - 1]
+    if not text[length - 1].isspace():
+        words = head.rsplit(None, 1)
+        if len(words) == 2:
+            head = words[0]
+    return head.rstrip() + '…'
+
+
+def fill_excerpt(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    length = Post._meta.get_field('excerpt').max_length
+    batch = []
+    for post in Post.objects.only('id', 'text').iterator():
+        post.excerpt = cut_at_word(post.text, length)
+        batch.append(post)
+        if len(batch) == BATCH_SIZE:
+            Post.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=core.models.ExcerptField(blank=True, editable=False, max_length=300, verbose_name='Отрывок'),
+        ),
+        migrations.RunPython(fill_excerpt, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from core.models import BaseModel
+from core.models import BaseModel, ExcerptField
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.urls import reverse
@@ -6,6 +6,20 @@ from django.db.models import CheckConstraint, Q, F, UniqueConstraint
 
 User = get_user_model()
 POST_STR_NAME_LENGTH = 15
+POST_EXCERPT_LENGTH = 300
+# Поля, которые выводит карточка поста в лентах.
+POST_CARD_FIELDS = (
+    'id', 'created', 'image', 'excerpt',
+    'author', 'author__username', 'author__first_name', 'author__last_name',
+    'group', 'group__slug', 'group__title',
+)
+
+
+class PostQuerySet(models.QuerySet):
+    def cards(self) -> 'PostQuerySet':
+        """Посты для ленты: только поля карточки, без полного текста
+        и лишних полей автора (пароль, почта, флаги)."""
+        return self.select_related('group', 'author').only(*POST_CARD_FIELDS)
 
 
 class Group(models.Model):
@@ -37,15 +51,35 @@ class Post(BaseModel):
         help_text='Выбор группы, к которой относится текст'
     )
     image = models.ImageField('Картинка', upload_to='posts/', default='no_foto.jpeg', blank=True)
+    comments_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False)
+    excerpt = ExcerptField('Отрывок', max_length=POST_EXCERPT_LENGTH)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:POST_STR_NAME_LENGTH]
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse("posts:post_detail", kwargs={"post_id": self.pk})
 
     class Meta:
         ordering = ['-created']
+        # Ленты автора и группы: диапазон по индексу, прочитанный с конца,
+        # уже отсортирован по (-created, -id), т.к. индекс SQLite
+        # заканчивается rowid. С полем '-created' порядок id был бы обратным.
+        indexes = [
+            models.Index(
+                fields=['author', 'created'], name='post_author_created'),
+            models.Index(
+                fields=['group', 'created'], name='post_group_created'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -65,6 +99,10 @@ class Comment(BaseModel):
     )
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created'),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -101,3 +139,74 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class AuthorStats(models.Model):
+    """Счётчики пользователя, поддерживаемые сигналами posts.signals.
+
+    Пересчитываются командой recount_stats."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        verbose_name='Пользователь',
+        related_name='stats',
+        on_delete=models.CASCADE
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+    def __str__(self):
+        return f'Счётчики {self.user_id}'
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок пользователя.
+
+    Заполняется при публикации поста (fan-out on write), дополняется
+    и очищается при подписке и отписке. Посты авторов с числом
+    подписчиков больше settings.TIMELINE_FANOUT_LIMIT сюда не попадают
+    и подмешиваются в ленту при чтении."""
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        related_name='timeline',
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        related_name='timeline_entries',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    created = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'post'],
+                name='post already in timeline'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'created', 'post'],
+                name='timeline_user_created_post'),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author'),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+    def __str__(self):
+        return f'{self.post_id} в ленте {self.user_id}'
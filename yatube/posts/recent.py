@@ -0,0 +1,181 @@
+"""Последние посты авторов в кэше.
+
+Для каждого автора в кэше лежат ключи сортировки (created, id) его
+settings.RECENT_POSTS_LENGTH новейших постов, упакованные в array('q').
+Буфер не правится на месте: создание и удаление поста сдвигают
+поколение автора (core.generations, область recent:<id>), входящее
+в ключ буфера, и следующий читатель собирает новый. Поколение
+сдвигается и после фиксации транзакции, поэтому буфер, собранный
+читателем до фиксации, остаётся под старым поколением и больше
+не читается. Промахи всех авторов
+собираются одним запросом с ROW_NUMBER() по индексу (author, created).
+
+Первые страницы ленты подписок собираются слиянием буферов
+(heapq.merge) без выборки по Post с сортировкой: из базы читаются
+только подписки и посты страницы по первичному ключу. Страница,
+уходящая глубже буферов, возвращает None, и представление
+читает ленту как обычно."""
+import heapq
+from array import array
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core import generations
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils.functional import cached_property
+
+from .models import Follow, Post
+
+KEY_TEMPLATE: str = 'recent-posts:%s:%s'
+SCOPE_TEMPLATE: str = 'recent:%s'
+
+Entry = Tuple[int, int]
+
+
+def _stamp(created) -> int:
+    return int(created.timestamp() * 1000000)
+
+
+class Buffer:
+    """Новейшие посты автора, от новых к старым.
+
+    complete - в буфере все посты автора, а не только последние."""
+
+    def __init__(self, entries: List[Entry], complete: bool) -> None:
+        self.entries = entries
+        self.complete = complete
+
+    @classmethod
+    def load_many(cls, author_ids: List[int]) -> Dict[int, 'Buffer']:
+        """Буферы авторов одним запросом: LENGTH + 1 новейших постов
+        каждого автора, лишний пост означает неполный буфер."""
+        length = settings.RECENT_POSTS_LENGTH
+        ranked = Post.objects.filter(author_id__in=author_ids).annotate(
+            position=Window(
+                RowNumber(), partition_by=[F('author_id')],
+                order_by=[F('created').desc(), F('id').desc()]),
+        ).order_by().values_list('author_id', 'created', 'id', 'position')
+        sql, params = ranked.query.sql_with_params()
+        entries: Dict[int, List[Entry]] = {
+            author_id: [] for author_id in author_ids}
+        # Django 2.2 не фильтрует по оконным функциям: отбор по номеру -
+        # во внешнем запросе, raw() приводит created к datetime.
+        for post in Post.objects.raw(
+                f'SELECT id, author_id, created FROM ({sql}) '
+                f'WHERE position <= %s ORDER BY author_id, position',
+                (*params, length + 1)):
+            entries[post.author_id].append((_stamp(post.created), post.id))
+        return {
+            author_id: cls(author_entries[:length],
+                           len(author_entries) <= length)
+            for author_id, author_entries in entries.items()
+        }
+
+    @classmethod
+    def unpack(cls, data: Tuple[bool, bytes]) -> 'Buffer':
+        complete, raw = data
+        values = array('q')
+        values.frombytes(raw)
+        return cls(list(zip(values[::2], values[1::2])), complete)
+
+    def pack(self) -> Tuple[bool, bytes]:
+        return self.complete, array(
+            'q', [value for entry in self.entries for value in entry]
+        ).tobytes()
+
+
+def _keys(author_ids: List[int]) -> Dict[str, int]:
+    current = generations.get_generations(
+        *(SCOPE_TEMPLATE % author_id for author_id in author_ids))
+    return {
+        KEY_TEMPLATE % (author_id, current[SCOPE_TEMPLATE % author_id]):
+            author_id
+        for author_id in author_ids
+    }
+
+
+def get_buffers(author_ids: Iterable[int]) -> Dict[int, Buffer]:
+    """Буферы авторов: поколения и буферы - по запросу к кэшу,
+    недостающие собираются одним запросом к базе."""
+    keys = _keys(list(author_ids))
+    found = cache.get_many(keys)
+    buffers = {
+        keys[key]: Buffer.unpack(data) for key, data in found.items()}
+    missing = [author_id for key, author_id in keys.items()
+               if key not in found]
+    if missing:
+        loaded = Buffer.load_many(missing)
+        buffers.update(loaded)
+        cache.set_many(
+            {key: loaded[author_id].pack() for key, author_id in keys.items()
+             if author_id in loaded},
+            settings.RECENT_POSTS_TIME)
+    return buffers
+
+
+def forget(author_ids: Iterable[int]) -> None:
+    """Сбрасывает буферы авторов сразу и ещё раз после фиксации
+    транзакции: читатель мог собрать буфер между ними."""
+    scopes = [SCOPE_TEMPLATE % author_id for author_id in author_ids]
+    generations.bump(*scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: generations.bump(*scopes))
+
+
+def merge(buffers: Iterable[Buffer], offset: int,
+          limit: int) -> Optional[List[int]]:
+    """id постов [offset, offset + limit) в слиянии буферов.
+
+    None, если срез не определяется буферами: дальше старейшего
+    поста неполного буфера могут быть посты, которых в нём нет."""
+    buffers = [buffer for buffer in buffers if buffer.entries]
+    floor = max(
+        (buffer.entries[-1] for buffer in buffers if not buffer.complete),
+        default=None)
+    entries = list(islice(
+        heapq.merge(*(buffer.entries for buffer in buffers), reverse=True),
+        offset + limit))
+    if floor is not None and (
+            len(entries) < offset + limit or entries[-1] < floor):
+        return None
+    return [post_id for _, post_id in entries[offset:]]
+
+
+def author_posts(author_id: int, offset: int,
+                 limit: int) -> Optional['PostList']:
+    ids = merge(get_buffers([author_id]).values(), offset, limit)
+    return None if ids is None else PostList(ids)
+
+
+def follow_posts(user_id: int, offset: int,
+                 limit: int) -> Optional['PostList']:
+    """Страница ленты подписок из буферов авторов."""
+    author_ids = Follow.objects.filter(
+        user_id=user_id).values_list('author_id', flat=True)
+    ids = merge(get_buffers(author_ids).values(), offset, limit)
+    return None if ids is None else PostList(ids)
+
+
+class PostList(Sequence):
+    """Посты по списку id в его порядке.
+
+    Загружаются одним in_bulk при первом обращении, поэтому страница,
+    закэшированная целиком, не обращается к базе."""
+
+    def __init__(self, ids: List[int]) -> None:
+        self.ids = ids
+
+    @cached_property
+    def posts(self) -> List[Post]:
+        found = Post.objects.cards().in_bulk(self.ids)
+        return [found[post_id] for post_id in self.ids if post_id in found]
+
+    def __len__(self) -> int:
+        return len(self.posts)
+
+    def __getitem__(self, index):
+        return self.posts[index]
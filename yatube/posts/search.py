@@ -0,0 +1,92 @@
+"""Полнотекстовый поиск по постам.
+
+Бэкенд выбирается настройкой SEARCH_BACKEND. Локальный бэкенд -
+инвертированный индекс SQLite FTS5 (таблица posts_post_fts), который
+обновляется сигналами при сохранении и удалении поста. Результаты
+упорядочены по релевантности bm25 с поправкой на давность поста."""
+import re
+from functools import lru_cache
+from typing import List
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import QuerySet
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+FTS_TABLE: str = 'posts_post_fts'
+
+
+def tokenize(query: str) -> List[str]:
+    return re.findall(r'\w+', query.lower())
+
+
+class SimpleBackend:
+    """Поиск без индекса (LIKE), для баз без FTS."""
+
+    def index(self, post: Post) -> None:
+        pass
+
+    def remove(self, post_id: int) -> None:
+        pass
+
+    def rebuild(self) -> None:
+        pass
+
+    def search(self, query: str) -> QuerySet:
+        posts = Post.objects.all()
+        words = tokenize(query)
+        if not words:
+            return posts.none()
+        for word in words:
+            posts = posts.filter(text__icontains=word)
+        return posts
+
+
+class SqliteFTSBackend(SimpleBackend):
+    """Инвертированный индекс SQLite FTS5."""
+
+    def index(self, post: Post) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text])
+
+    def remove(self, post_id: int) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+    def rebuild(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                f'SELECT id, text FROM {Post._meta.db_table}')
+
+    def search(self, query: str) -> QuerySet:
+        words = tokenize(query)
+        if not words:
+            return Post.objects.none()
+        # Каждое слово в кавычках: пользовательский ввод не разбирается
+        # как синтаксис FTS, последнее слово ищется по префиксу.
+        match = ' '.join(f'"{word}"' for word in words) + '*'
+        post_table = Post._meta.db_table
+        return Post.objects.extra(
+            select={'rank': (
+                f'bm25({FTS_TABLE}) / (1.0 + (julianday(\'now\') '
+                f'- julianday({post_table}.created)) / %s)')},
+            select_params=[settings.SEARCH_RECENCY_DAYS],
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {post_table}.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+        ).order_by('rank', '-created')
+
+
+@lru_cache(maxsize=None)
+def get_backend() -> SimpleBackend:
+    return import_string(settings.SEARCH_BACKEND)()
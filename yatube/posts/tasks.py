@@ -0,0 +1,18 @@
+"""Фоновые задачи постов (core.tasks)."""
+from core.models import Task
+from core.tasks import task
+
+from . import timeline
+from .models import Post
+
+
+@task(priority=Task.PRIORITY_HIGH)
+def delete_post(post_id: int) -> None:
+    """Удаляет пост с комментариями и записями лент подписчиков."""
+    Post.objects.filter(pk=post_id).delete()
+
+
+@task()
+def backfill_followers(author_id: int) -> None:
+    """Раскладывает посты автора, опустившегося до порога раскладки."""
+    timeline.backfill_followers(author_id)
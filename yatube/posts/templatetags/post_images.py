@@ -0,0 +1,13 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, alias):
+    """Готовая миниатюра картинки поста или None.
+
+    В отличие от {% thumbnail %} никогда не режет картинку в запросе."""
+    return thumbnails.lookup(image, alias)
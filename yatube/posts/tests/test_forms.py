@@ -1,10 +1,13 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import F
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from posts.forms import PostForm
 from posts.models import Comment, Group, Post, User
 
 # Тесты:
@@ -124,6 +127,24 @@ class PostCreateFormTests(TestCase):
         self.assertIs(Post.objects.filter(
             author=self.usr, text=self.t_post.text).exists(), False)
 
+    def test_post_edit_keeps_comments_count(self):
+        """Правка поста не затирает счётчик комментариев,
+           изменившийся во время запроса."""
+        edit_name, edit_args = self.names_with_args['post_edit']
+
+        def comment_meanwhile(form):
+            Post.objects.filter(pk=form.instance.pk).update(
+                comments_count=F('comments_count') + 1)
+            return form.cleaned_data
+
+        count = Post.objects.get(pk=self.t_post.pk).comments_count
+        with mock.patch.object(PostForm, 'clean', comment_meanwhile):
+            self.tester.post(reverse(edit_name, kwargs=edit_args),
+                             data={'text': 'Правка'})
+        post = Post.objects.get(pk=self.t_post.pk)
+        self.assertEqual(post.text, 'Правка')
+        self.assertEqual(post.comments_count, count + 1)
+
     def test_no_auth_user_create_post(self):
         """Проверка отсутствия возможности неавторизованному
            пользователю создать пост."""
@@ -1,6 +1,11 @@
+from io import StringIO
+
+from core.models import cut_at_word
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import POST_STR_NAME_LENGTH, Group, Post, User
+from ..models import (POST_EXCERPT_LENGTH, POST_STR_NAME_LENGTH, AuthorStats,
+                      Comment, Follow, Group, Post, User)
 
 # Тесты:
 #  Валидация полей моделей.
@@ -61,3 +66,85 @@ class PostModelText(TestCase):
                     Post._meta.get_field(field).verbose_name,
                     expected_verbose_name
                 )
+
+    def test_post_excerpt(self):
+        """Отрывок заполняется при сохранении и при bulk_create."""
+        self.assertEqual(self.post.excerpt, self.post.text)
+        self.post.text = 'слово ' * POST_EXCERPT_LENGTH
+        self.post.save(update_fields=['text'])
+        self.post.refresh_from_db()
+        self.assertLessEqual(len(self.post.excerpt), POST_EXCERPT_LENGTH)
+        self.assertTrue(self.post.excerpt.endswith('слово…'))
+        Post.objects.bulk_create([Post(text='bulk', author=self.user)])
+        self.assertEqual(Post.objects.get(text='bulk').excerpt, 'bulk')
+
+    def test_cut_at_word(self):
+        """Отрывок обрезается по слову."""
+        text = 'понедельник вторник среда'
+        self.assertEqual(cut_at_word(text, 15), 'понедельник…')
+        self.assertEqual(cut_at_word(text, 13), 'понедельник…')
+        self.assertEqual(cut_at_word(text, len(text)), text)
+        self.assertEqual(cut_at_word('понедельник', 5), 'поне…')
+
+    def test_post_updated(self):
+        """Дата изменения обновляется при сохранении, дата создания - нет."""
+        post = Post.objects.create(text='до правки', author=self.user)
+        created, updated = post.created, post.updated
+        self.assertGreaterEqual(updated, created)
+        post.text = 'после правки'
+        post.save()
+        self.assertEqual(post.created, created)
+        self.assertGreater(post.updated, updated)
+        updated = post.updated
+        post.text = 'ещё раз'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertGreater(post.updated, updated)
+        self.assertEqual(post.excerpt, 'ещё раз')
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+
+    def assertStats(self, user, posts, followers, following):
+        stats = AuthorStats.objects.get(user=user)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count, stats.following_count),
+            (posts, followers, following))
+
+    def test_counters_follow_posts_and_follows(self):
+        """Счётчики меняются при создании и удалении постов и подписок."""
+        post = Post.objects.create(text='пост', author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertStats(self.author, 1, 1, 0)
+        self.assertStats(self.reader, 0, 0, 1)
+        post.delete()
+        follow.delete()
+        self.assertStats(self.author, 0, 0, 0)
+        self.assertStats(self.reader, 0, 0, 0)
+
+    def test_counters_do_not_go_below_zero(self):
+        """Разошедшиеся счётчики не уходят ниже нуля при удалении."""
+        post = Post.objects.create(text='пост', author=self.author)
+        Comment.objects.create(text='к', author=self.reader, post=post)
+        AuthorStats.objects.update(posts_count=0)
+        Post.objects.update(comments_count=0)
+        Comment.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        post.delete()
+        self.assertStats(self.author, 0, 0, 0)
+
+    def test_recount_stats_command(self):
+        """Команда recount_stats восстанавливает счётчики."""
+        Post.objects.bulk_create(
+            [Post(text=str(i), author=self.author) for i in range(3)])
+        AuthorStats.objects.filter(user=self.reader).delete()
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.update(posts_count=0)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertStats(self.author, 3, 1, 0)
+        self.assertStats(self.reader, 0, 0, 1)
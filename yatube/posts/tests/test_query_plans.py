@@ -0,0 +1,98 @@
+import re
+from typing import List
+from unittest import skipUnless
+
+from core.pagination import KeysetPaginator
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+# Тесты:
+#  Запросы лент читают диапазон индекса в порядке вывода:
+#  в плане нет полного просмотра таблицы и временной сортировки.
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\S+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class FeedQueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='group', slug='group', description='group')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            text='post', author=cls.author, group=cls.group)
+        Comment.objects.create(
+            text='comment', author=cls.reader, post=cls.post)
+        cls.posts = Post.objects.select_related('group', 'author')
+
+    def plan(self, queryset: QuerySet) -> List[str]:
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedPlan(self, queryset: QuerySet,
+                          allow_sort: bool = False) -> None:
+        plan = self.plan(queryset)
+        for detail in plan:
+            self.assertIsNone(
+                FULL_SCAN.match(detail),
+                f'Полный просмотр таблицы: {plan}\n{queryset.query}')
+            if not allow_sort:
+                self.assertNotIn(
+                    TEMP_SORT, detail,
+                    f'Сортировка во временном B-дереве: {plan}\n'
+                    f'{queryset.query}')
+
+    def keyset_next(self, queryset: QuerySet,
+                    ordering=('-created', '-id')) -> QuerySet:
+        paginator = KeysetPaginator(queryset, 4, ordering=ordering)
+        key = [getattr(self.post, name.lstrip('-')) for name in ordering]
+        return queryset.order_by(*ordering).filter(
+            paginator._seek(key, forward=True))[:5]
+
+    def test_index_feed(self):
+        self.assertIndexedPlan(self.posts.all()[:4])
+        self.assertIndexedPlan(self.keyset_next(self.posts.all()))
+
+    def test_group_feed(self):
+        posts = self.posts.filter(group=self.group)
+        self.assertIndexedPlan(posts[:4])
+        self.assertIndexedPlan(self.keyset_next(posts))
+        self.assertIndexedPlan(posts.order_by().values('pk'))
+
+    def test_profile_feed(self):
+        posts = self.posts.filter(author=self.author)
+        self.assertIndexedPlan(posts[:4])
+        self.assertIndexedPlan(self.keyset_next(posts))
+        self.assertIndexedPlan(posts.order_by().values('pk'))
+        self.assertIndexedPlan(Follow.objects.filter(
+            user=self.reader, author=self.author))
+
+    def test_follow_feed(self):
+        self.assertIndexedPlan(timeline.follow_feed(self.reader)[:4])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_feed_heavy_authors(self):
+        """Подмешивание постов популярных авторов (OR двух диапазонов)
+           сортируется в памяти, но по индексам."""
+        self.assertIndexedPlan(
+            timeline.follow_feed(self.reader)[:4], allow_sort=True)
+
+    def test_comments_page(self):
+        comments = self.post.comments.select_related('author')
+        ordering = ('created', 'id')
+        self.assertIndexedPlan(comments.order_by(*ordering)[:21])
+        paginator = KeysetPaginator(comments, 20, ordering=ordering)
+        comment = comments.first()
+        self.assertIndexedPlan(comments.order_by(*ordering).filter(
+            paginator._seek([comment.created, comment.id], True))[:21])
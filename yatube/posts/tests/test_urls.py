@@ -1,6 +1,7 @@
 from http import HTTPStatus as HTTPs
 
-from django.test import Client, TestCase
+from core.test import BudgetClient
+from django.test import TestCase
 from posts.models import User
 
 from ..models import Group, Post
@@ -16,13 +17,13 @@ class PostsURLTests(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         # Неавторизованный клиент
-        cls.guest_client = Client()
+        cls.guest_client = BudgetClient()
         # Авторизованный клиент
-        cls.tester = Client()
+        cls.tester = BudgetClient()
         cls.usr = User.objects.create(username='tester')
         cls.tester.force_login(cls.usr)
         # Авторизованный клиент(не автор поста)
-        cls.no_author = Client()
+        cls.no_author = BudgetClient()
         cls.user_no_author = User.objects.create(username='no_author')
         cls.no_author.force_login(cls.user_no_author)
 
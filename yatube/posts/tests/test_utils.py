@@ -1,8 +1,27 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from core import tasks
+from core.models import Task
+from core.test import BudgetClient, UsersTestCase
 from core.views import POSTS_ON_PAGE
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Post, User
+from posts import recent, thumbnails, timeline
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                          User)
+from posts.templatetags.post_cards import fast_reverse
+from posts.urls import urlpatterns
 
 
 class PaginatorViewsTest(TestCase):
@@ -34,16 +53,198 @@ class PaginatorViewsTest(TestCase):
 
     def test_cache_test(self) -> None:
         'Работа кэша'
+        cache.clear()
         response_1 = self.guest_client.get(reverse(self.index_page))
-        Post.objects.create(text='test_post', author=self.paginator_tester)
+        # update() обходит сигналы, поэтому страница остаётся в кэше.
+        Post.objects.filter(pk=Post.objects.first().pk).update(
+            text='изменено в обход сигналов')
         response_2 = self.guest_client.get(reverse(self.index_page))
         self.assertEqual(
             response_1.content,
             response_2.content,
-            'Результат запросов до создания поста и после создания отличается')
-        cache.clear()
+            'Страница ленты не взята из кэша')
+        Post.objects.create(text='test_post', author=self.paginator_tester)
         response_3 = self.guest_client.get(reverse('posts:index'))
         self.assertNotEqual(
             response_1.content,
             response_3.content,
-            'Результат запроса после очистки кэша не изменился')
+            'Новый пост не сбросил кэш ленты')
+        self.assertIn('test_post', response_3.content.decode())
+
+
+class BenchmarkCommandsTest(TestCase):
+    def test_generate_data_and_benchmark(self):
+        """Генератор создаёт данные с производными, бенчмарк
+           обходит все адреса posts.urls."""
+        call_command('generate_data', users=20, groups=3, posts=100,
+                     comments=200, follows=60, seed=1, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 100)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(TimelineEntry.objects.exists())
+        author = User.objects.order_by('-stats__posts_count').first()
+        self.assertEqual(author.stats.posts_count, author.posts.count())
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('author_id')).exists())
+        out = StringIO()
+        call_command('benchmark', requests=2, warmup=0, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(
+            {row['name'] for row in results},
+            {pattern.name for pattern in urlpatterns})
+        for row in results:
+            if 'skipped' not in row:
+                self.assertIn(row['status'], (200, 302))
+                self.assertLessEqual(row['p50'], row['p99'])
+
+
+class PostCardsTest(TestCase):
+    def test_fast_reverse(self):
+        """Адреса по образцу совпадают с reverse()."""
+        for name, value in (
+            ('posts:profile', 'user.name+tag@mail'),
+            ('posts:profile', 'Пользователь'),
+            ('posts:post_detail', 42),
+            ('posts:group_list', 'group-slug_1'),
+        ):
+            with self.subTest(name=name, value=value):
+                self.assertEqual(
+                    fast_reverse(name, value), reverse(name, args=[value]))
+
+    def test_cards_rendered(self):
+        author = User.objects.create(
+            username='cards_tester', first_name='Имя', last_name='Фамилия')
+        group = Group.objects.create(
+            title='Группа карточек', slug='cards', description='cards')
+        post = Post.objects.create(text='карточка', author=author, group=group)
+        response = Client().get(reverse('posts:index'))
+        self.assertTemplateUsed(response, 'posts/includes/post_cards.html')
+        for text in ('Имя Фамилия', 'карточка', 'Группа карточек',
+                     reverse('posts:post_detail', args=[post.pk]),
+                     reverse('posts:profile', args=[author.username]),
+                     reverse('posts:group_list', args=[group.slug])):
+            self.assertContains(response, text)
+
+
+class ThumbnailsTest(TestCase):
+    def test_lookup_does_not_generate(self):
+        """Шаблон только читает миниатюры: промах ничего не нарезает."""
+        with mock.patch.object(thumbnails, 'generate_task') as generate:
+            self.assertIsNone(
+                thumbnails.lookup(Post(image='posts/old.jpg').image, 'card'))
+            self.assertIsNone(thumbnails.lookup(Post().image, 'card'))
+        self.assertEqual(generate.mock_calls, [])
+
+    def test_schedule_skips_default_and_missing(self):
+        with mock.patch.object(thumbnails.transaction, 'on_commit') as later:
+            for name in ('', thumbnails.DEFAULT_IMAGE, 'posts/missing.jpg'):
+                thumbnails.schedule(name)
+        later.assert_not_called()
+
+    @override_settings(TASKS_EAGER=False)
+    def test_broken_image_task_retried(self):
+        """Ошибка нарезки в задаче не глотается: задача повторяется."""
+        queued = thumbnails.generate_task.delay('posts/missing.gif')
+        with self.assertLogs('sorl.thumbnail', 'WARNING'), \
+                self.assertLogs('core.tasks', 'ERROR'):
+            self.assertEqual(tasks.work('test', burst=True), 0)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn('OSError', queued.last_error)
+
+    def test_generate_thumbnails_command(self):
+        """Миниатюры старых постов нарезает команда, а не запрос."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        author = User.objects.create(username='thumbnail_author')
+        with override_settings(MEDIA_ROOT=media_root):
+            name = default_storage.save('posts/old.gif', ContentFile(b'GIF'))
+            for image in (name, 'posts/missing.gif', ''):
+                Post.objects.create(text=image, image=image, author=author)
+            Post.objects.create(text='по умолчанию', author=author)
+            with mock.patch.object(thumbnails, 'generate') as generate:
+                call_command('generate_thumbnails', stdout=StringIO())
+        generate.assert_called_once_with(name)
+
+
+@override_settings(RECENT_POSTS_ENABLED=True, RECENT_POSTS_LENGTH=6)
+class RecentPostsTest(UsersTestCase):
+    # Первые страницы укладываются в бюджет и с холодными буферами.
+    client_class = BudgetClient
+    users = {'reader': 'recent_reader'}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create(username=f'recent_author{i}')
+            for i in range(2)]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self) -> None:
+        super().setUp()
+        for i in range(5):
+            for author in self.authors:
+                Post.objects.create(
+                    text=f'{author.username} {i}', author=author, image='')
+
+    def test_merge(self):
+        complete = recent.Buffer([(5, 5), (3, 3)], complete=True)
+        partial = recent.Buffer([(4, 4), (2, 2)], complete=False)
+        self.assertEqual(recent.merge([complete, partial], 0, 3), [5, 4, 3])
+        self.assertEqual(recent.merge([complete, partial], 1, 3), [4, 3, 2])
+        self.assertIsNone(recent.merge([complete, partial], 2, 3))
+        self.assertEqual(recent.merge([complete], 1, 3), [3])
+
+    def test_follow_feed_from_buffers(self):
+        url = reverse('posts:follow_index')
+        expected = list(timeline.follow_feed(self.reader)[:POSTS_ON_PAGE])
+        # Буферы собраны заранее.
+        recent.get_buffers(author.pk for author in self.authors)
+        with CaptureQueriesContext(connection) as context:
+            response = self.reader_client.get(url)
+        self.assertEqual(list(response.context['page_obj']), expected)
+        post_sql = [query['sql'] for query in context.captured_queries
+                    if 'FROM "posts_post"' in query['sql']]
+        self.assertEqual(len(post_sql), 1)
+        self.assertIn('"posts_post"."id" IN', post_sql[0])
+        self.assertEqual(response.context['paginator'].count, 10)
+        # Вторая страница глубже буферов: лента читается из базы.
+        response = self.reader_client.get(url, {'page': 2})
+        self.assertEqual(
+            list(response.context['page_obj']),
+            list(timeline.follow_feed(self.reader)[
+                POSTS_ON_PAGE:POSTS_ON_PAGE * 2]))
+
+    def test_cold_buffers_loaded_in_one_query(self):
+        for i in range(3):
+            Post.objects.create(
+                text=f'ещё {i}', author=self.authors[0], image='')
+        with self.assertNumQueries(1):
+            buffers = recent.get_buffers(
+                author.pk for author in self.authors)
+        full, short = (buffers[author.pk] for author in self.authors)
+        self.assertFalse(full.complete)
+        self.assertEqual(
+            [post_id for _, post_id in full.entries],
+            list(self.authors[0].posts.order_by(
+                '-created', '-id').values_list('id', flat=True)[:6]))
+        self.assertTrue(short.complete)
+        self.assertEqual(len(short.entries), 5)
+        with self.assertNumQueries(0):
+            recent.get_buffers(author.pk for author in self.authors)
+
+    def test_buffers_follow_create_and_delete(self):
+        url = reverse('posts:profile', args=[self.authors[0].username])
+        self.reader_client.get(url)
+        newest = Post.objects.create(
+            text='новый', author=self.authors[0], image='')
+        self.assertEqual(
+            self.reader_client.get(url).context['page_obj'][0], newest)
+        newest.delete()
+        posts = list(self.reader_client.get(url).context['page_obj'])
+        self.assertNotIn(newest, posts)
+        self.assertEqual(
+            posts, list(self.authors[0].posts.all()[:POSTS_ON_PAGE]))
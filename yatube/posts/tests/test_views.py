@@ -1,16 +1,23 @@
 import shutil
 import tempfile
+import time
 from collections import namedtuple
+from unittest import mock
 
+from core.test import BudgetClient
+from core.views import COMMENTS_ON_PAGE
 from django import forms
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db import IntegrityError as dbIntegrityError
+from django.db import connection
 from django.db.utils import IntegrityError as djangoIntegrityError
-from django.test import Client, TestCase, override_settings
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Comment, Follow, Group, Post, User
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
 
 # Тесты:
 #  При обращении к определённому имени url, вызывается правильный шаблон.
@@ -33,12 +40,12 @@ class TestPostsViews(TestCase):
         User.objects.bulk_create(test_users)
         cls.tester_1, cls.tester_2 = User.objects.all()
         # Неавторизованный клиент
-        cls.guest_client = Client()
+        cls.guest_client = BudgetClient()
         # Авторизованный клиент
-        cls.auth_client = Client()
+        cls.auth_client = BudgetClient()
         cls.auth_client.force_login(cls.tester_1)
         # Авторизованный клиент для проверки подписки
-        cls.follower = Client()
+        cls.follower = BudgetClient()
         cls.follower.force_login(cls.tester_2)
         # Создание тестовых групп
         test_groups = [Group(
@@ -88,6 +95,10 @@ class TestPostsViews(TestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self) -> None:
+        # Поколения и кэш лент переживают откат базы между тестами.
+        cache.clear()
+
     def test_pages_uses_correct_templates(self):
         """URL адреса приложения posts используют правильный шаблон."""
         list_pages = [self.index_page, self.group_list_page, self.profile_page,
@@ -132,6 +143,32 @@ class TestPostsViews(TestCase):
             post.comments.all()[0]
         )
 
+    def test_post_detail_comments_paginated(self):
+        """Комментарии на странице поста выводятся страницами
+           вместе с авторами, счётчик комментариев растёт."""
+        Comment.objects.bulk_create([Comment(
+            text=str(i), author=self.tester_2, post=self.t_post
+        ) for i in range(COMMENTS_ON_PAGE)])
+        Comment.objects.create(
+            text='последний', author=self.tester_2, post=self.t_post)
+        self.t_post.refresh_from_db()
+        self.assertEqual(self.t_post.comments_count, 2)
+        url = reverse(
+            self.post_detail_page.name, args=self.post_detail_page.arg)
+        response = self.auth_client.get(url)
+        page = response.context['comments_page']
+        self.assertEqual(len(page), COMMENTS_ON_PAGE)
+        self.assertEqual(page[0], self.t_comment)
+        self.assertTrue(page.has_next())
+        response = self.auth_client.get(url, {'comments': page.next_cursor})
+        self.assertEqual(
+            [comment.text for comment in response.context['comments_page']],
+            [str(COMMENTS_ON_PAGE - 1), 'последний'])
+        # Разошедшийся счётчик не прячет комментарии.
+        Post.objects.update(comments_count=0)
+        cache.clear()
+        self.assertContains(self.auth_client.get(url), 'test_comment')
+
     def test_post_create_initial_value(self):
         """Предустановленнное значение post_create."""
         response = self.guest_client.get(reverse(self.post_create_page.name))
@@ -271,6 +308,150 @@ class TestPostsViews(TestCase):
         self.assertNotIn(follower_post, response.context['posts'],
                          'Пост отобразился у не подписанного пользователя')
 
+    def test_timeline_filled_on_follow_and_post(self):
+        """Подписка переносит посты автора в ленту подписчика,
+           новые посты раскладываются сразу, отписка очищает ленту."""
+        Follow.objects.create(user=self.tester_2, author=self.tester_1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.tester_2, post=self.t_post).exists())
+        new_post = Post.objects.create(text='новый', author=self.tester_1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.tester_2, post=new_post).exists())
+        Follow.objects.filter(
+            user=self.tester_2, author=self.tester_1).delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.tester_2).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_heavy_author_read_on_fan_out(self):
+        """Посты автора с большим числом подписчиков не раскладываются,
+           но попадают в ленту подписок при чтении."""
+        self.follower.get(reverse(
+            self.profile_follow_page.name,
+            args=self.profile_follow_page.arg))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.tester_2).exists())
+        response = self.follower.get(reverse(self.follow_index_page.name))
+        self.assertEqual(response.context['posts'][0], self.t_post)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_timeline_backfilled_below_fan_out_limit(self):
+        """Отписка, опустившая автора до порога, раскладывает его посты,
+           опубликованные за время над порогом."""
+        other = User.objects.create(username='other_follower')
+        Follow.objects.create(user=self.tester_2, author=self.tester_1)
+        Follow.objects.create(user=other, author=self.tester_1)
+        new_post = Post.objects.create(
+            text='над порогом', author=self.tester_1)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.tester_2).values_list('post_id', flat=True)),
+            {self.t_post.pk, new_post.pk})
+
+    def test_profile_following_flag(self):
+        """Признак подписки в профиле и постоянное число запросов."""
+        url = reverse(self.profile_page.name, args=self.profile_page.arg)
+        response = self.follower.get(url)
+        self.assertFalse(response.context['following'])
+        Follow.objects.create(user=self.tester_2, author=self.tester_1)
+        response = self.follower.get(url)
+        self.assertTrue(response.context['following'])
+        Post.objects.bulk_create([
+            Post(text=str(i), author=self.tester_1) for i in range(3)])
+        # Сессия, пользователь, автор с подпиской, посты;
+        # COUNT(*) взят из кэша ленты.
+        with self.assertNumQueries(4):
+            self.follower.get(url + '?page=1')
+
+    def test_search(self):
+        """Поиск находит посты по словам, следит за правкой и удалением."""
+        url = reverse('posts:search')
+        relevant = Post.objects.create(
+            text='Кошки, кошки и ещё раз кошки', author=self.tester_2)
+        other = Post.objects.create(
+            text='Пост про собак и одну кошку', author=self.tester_2)
+        response = self.guest_client.get(url, {'q': 'кошки'})
+        self.assertEqual(list(response.context['page_obj']), [relevant])
+        response = self.guest_client.get(url, {'q': 'кош'})
+        self.assertEqual(
+            list(response.context['page_obj']), [relevant, other])
+        other.text = 'Пост про собак'
+        other.save()
+        response = self.guest_client.get(url, {'q': 'собак'})
+        self.assertEqual(list(response.context['page_obj']), [other])
+        other.delete()
+        response = self.guest_client.get(url, {'q': 'собак'})
+        self.assertEqual(len(response.context['page_obj']), 0)
+        response = self.guest_client.get(url, {'q': '"*'})
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_feed_loads_card_fields_only(self):
+        """Ленты не читают полный текст поста и лишние поля автора."""
+        Follow.objects.create(user=self.tester_2, author=self.tester_1)
+        pages = (
+            (self.guest_client, self.index_page),
+            (self.guest_client, self.group_list_page),
+            (self.guest_client, self.profile_page),
+            (self.follower, self.follow_index_page),
+        )
+        for client, page in pages:
+            with self.subTest(page=page.name):
+                with CaptureQueriesContext(connection) as context:
+                    response = client.get(reverse(page.name, args=page.arg))
+                self.assertContains(response, self.t_post.excerpt)
+                feed_sql = [
+                    query['sql'] for query in context.captured_queries
+                    if '"posts_post"."excerpt"' in query['sql']]
+                self.assertEqual(len(feed_sql), 1)
+                self.assertNotIn('"posts_post"."text"', feed_sql[0])
+                self.assertNotIn('"auth_user"."email"', feed_sql[0])
+
+    def test_conditional_get(self):
+        """Повторный запрос неизменившейся страницы получает 304
+           без выборки постов, изменение данных сбрасывает валидатор."""
+        pages = (
+            self.index_page, self.group_list_page,
+            self.profile_page, self.post_detail_page,
+        )
+        for page in pages:
+            with self.subTest(page=page.name):
+                url = reverse(page.name, args=page.arg)
+                response = self.guest_client.get(url)
+                etag = response['ETag']
+                with self.assertNumQueries(0 if page.arg == '' else 1):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                # Дата отдаётся, когда с изменения прошла целая секунда.
+                with mock.patch('core.validators.time.time',
+                                return_value=time.time() + 2):
+                    last_modified = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)['Last-Modified']
+                    response = self.guest_client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=last_modified)
+                    self.assertEqual(response.status_code, 304)
+                    response = self.auth_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('private', response['Cache-Control'])
+                # Дата не различает зрителей и вошедшим не отдаётся.
+                self.assertFalse(response.has_header('Last-Modified'))
+        url = reverse(self.post_detail_page.name,
+                      args=self.post_detail_page.arg)
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(
+            text='new_comment', author=self.tester_2, post=self.t_post)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        url = reverse(self.profile_page.name, args=self.profile_page.arg)
+        etag = self.follower.get(url)['ETag']
+        Follow.objects.create(user=self.tester_2, author=self.tester_1)
+        response = self.follower.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertTrue(response.context['following'])
+
     def test_cant_follow_dublicate(self):
         """Проверка отсутствия возможности подписаться
            на самого себя"""
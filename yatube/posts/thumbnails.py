@@ -0,0 +1,124 @@
+"""Миниатюры картинок постов, нарезанные заранее.
+
+Шаблоны только читают готовые миниатюры из хранилища sorl (kvstore)
+и никогда не режут картинку и не ставят нарезку в очередь. Нарезка -
+фоновая задача (core.tasks), которая ставится в очередь после
+сохранения загруженной картинки; миниатюры старых постов нарезает
+команда generate_thumbnails."""
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from core import timing
+from core.tasks import task
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from posts.models import Post
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+# Геометрии, которые используют шаблоны карточки и страницы поста.
+GEOMETRIES: Dict[str, Tuple[str, dict]] = {
+    'card': ('960x339', {'padding': True, 'crop': 'center'}),
+    'detail': ('960x339', {'padding': True, 'upscale': True,
+                           'crop': 'center'}),
+}
+# Картинка поста по умолчанию: файла нет, резать нечего.
+DEFAULT_IMAGE: str = Post._meta.get_field('image').default
+
+
+def is_upload(name: str) -> bool:
+    """Картинка загружена пользователем, а не пустая или по умолчанию."""
+    return bool(name) and name != DEFAULT_IMAGE
+
+
+@lru_cache(maxsize=4096)
+def _thumbnail_name(name: str, alias: str) -> str:
+    """Имя файла миниатюры так, как его назовёт sorl.thumbnail.get_thumbnail.
+
+    Имя зависит только от имени картинки и настроек, поэтому
+    вычисляется один раз: это хэш опций и разбор настроек sorl."""
+    geometry, options = GEOMETRIES[alias]
+    backend = default.backend
+    source = ImageFile(name)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def thumbnail_file(name: str, alias: str) -> ImageFile:
+    """Файл миниатюры картинки. Каждый вызов возвращает новый объект:
+    kvstore.get() и set_size() меняют его на месте."""
+    return ImageFile(_thumbnail_name(name, alias), default.storage)
+
+
+def _generate(name: str) -> None:
+    for geometry, options in GEOMETRIES.values():
+        thumbnail = get_thumbnail(name, geometry, **options)
+        # Ошибку чтения картинки sorl пишет в лог и возвращает
+        # несохранённую миниатюру без размера.
+        if not thumbnail.size:
+            raise OSError(f'Не удалось нарезать миниатюру {name}')
+
+
+def generate(name: str) -> None:
+    """Нарезает все миниатюры картинки; ошибка только пишется в лог."""
+    try:
+        _generate(name)
+    except Exception:
+        logger.exception('Не удалось нарезать миниатюру %s', name)
+
+
+@task()
+def generate_task(name: str) -> None:
+    """Нарезка в исполнителе. Ошибка не глотается: задача повторяется
+    до max_attempts и остаётся в очереди упавшей. Веб-процессы увидят
+    миниатюры, когда истечёт закэшированный ими промах
+    (THUMBNAIL_MISS_TIMEOUT)."""
+    _generate(name)
+
+
+def schedule(name: str) -> None:
+    """Ставит нарезку миниатюр в очередь после фиксации транзакции."""
+    if is_upload(name) and default_storage.exists(name):
+        transaction.on_commit(lambda: _queue(name))
+
+
+def _queue(name: str) -> None:
+    if settings.TASKS_EAGER:
+        # Без исполнителей нарезка идёт в самом запросе: ошибка
+        # не должна превращать сохранённый пост в ответ 500.
+        generate(name)
+    else:
+        generate_task.delay(name)
+
+
+def prefetch(posts: Iterable, alias: str) -> None:
+    """Загружает метаданные миниатюр страницы постов одним пакетом."""
+    kvstore = default.kvstore
+    if hasattr(kvstore, 'prefetch'):
+        with timing.measure('thumbnail'):
+            kvstore.prefetch([
+                thumbnail_file(post.image.name, alias)
+                for post in posts if is_upload(post.image.name)
+            ])
+
+
+def lookup(image, alias: str) -> Optional[ImageFile]:
+    """Готовая миниатюра картинки или None, если её ещё нет."""
+    if not image or not is_upload(image.name):
+        return None
+    with timing.measure('thumbnail'):
+        return default.kvstore.get(thumbnail_file(image.name, alias))
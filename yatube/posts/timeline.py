@@ -0,0 +1,125 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Посты обычных авторов раскладываются по лентам подписчиков в момент
+публикации, поэтому чтение ленты - один диапазон по индексу
+(user, -created). Авторы, у которых подписчиков больше
+settings.TIMELINE_FANOUT_LIMIT, не раскладываются: их посты
+подмешиваются при чтении (fan-out on read). Порог сверяется
+со счётчиком AuthorStats.followers_count. Когда отписка опускает
+автора до порога, его посты раскладываются по лентам всех
+подписчиков (backfill_followers), иначе посты, опубликованные
+за время над порогом, пропали бы из лент."""
+from itertools import islice
+from typing import Iterable, List
+
+from django.conf import settings
+from django.db.models import F, Q, QuerySet
+
+from .models import AuthorStats, Follow, Post, TimelineEntry, User
+
+BATCH_SIZE: int = 500
+
+
+def is_heavy_author(author_id: int) -> bool:
+    """Подписчиков у автора больше порога раскладки."""
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def heavy_authors_followed(user: User) -> List[int]:
+    """Авторы из подписок пользователя, чьи посты читаются напрямую."""
+    return list(user.follower.filter(
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('author_id', flat=True))
+
+
+def _insert(entries: Iterable[TimelineEntry]) -> None:
+    entries = iter(entries)
+    batch = list(islice(entries, BATCH_SIZE))
+    while batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, BATCH_SIZE))
+
+
+def reached_limit(author_id: int) -> bool:
+    """Подписчиков у автора ровно столько, сколько порог раскладки:
+    после отписки он перестал читаться напрямую."""
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out(post: Post) -> None:
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_heavy_author(post.author_id):
+        return
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      author_id=post.author_id, created=post.created)
+        for user_id in Follow.objects.filter(
+            author_id=post.author_id).values_list(
+                'user_id', flat=True).iterator()
+    )
+
+
+def backfill(user_id: int, author_id: int) -> None:
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if is_heavy_author(author_id):
+        return
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, created=created)
+        for post_id, created in Post.objects.filter(
+            author_id=author_id).values_list('id', 'created').iterator()
+    )
+
+
+def backfill_followers(author_id: int) -> None:
+    """Раскладывает все посты автора по лентам всех его подписчиков."""
+    if is_heavy_author(author_id):
+        return
+    posts = list(Post.objects.filter(
+        author_id=author_id).values_list('id', 'created'))
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, created=created)
+        for user_id in Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True).iterator()
+        for post_id, created in posts
+    )
+
+
+def trim(user_id: int, author_id: int) -> None:
+    """Убирает из ленты бывшего подписчика посты автора."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild() -> None:
+    """Пересобирает все ленты по текущим подпискам.
+
+    Нужна после массовой загрузки данных или пересчёта счётчиков
+    в обход сигналов."""
+    TimelineEntry.objects.all().delete()
+    for user_id, author_id in Follow.objects.values_list(
+            'user_id', 'author_id').iterator():
+        backfill(user_id, author_id)
+
+
+def follow_feed(user: User) -> QuerySet:
+    """Посты авторов, на которых подписан пользователь, новые сверху."""
+    posts = Post.objects.cards()
+    heavy = heavy_authors_followed(user)
+    if not heavy:
+        # Оба поля сортировки берутся из записи ленты: порядок совпадает
+        # с индексом (user, created, post) и не требует сортировки.
+        return posts.filter(timeline_entries__user=user).order_by(
+            F('timeline_entries__created').desc(),
+            F('timeline_entries__post').desc())
+    return posts.filter(
+        Q(id__in=TimelineEntry.objects.filter(
+            user=user).values('post_id'))
+        | Q(author_id__in=heavy)
+    )
@@ -2,7 +2,7 @@ from django.urls import path
 
 from .views import (AddCommentView, FollowIndex, GroupListView, IndexView,
                     PostCreateView, post_delete, PostDetailView, PostEditView,
-                    follow, ProfileView, unfollow)
+                    follow, ProfileView, SearchView, unfollow)
 
 app_name: str = 'posts'
 urlpatterns: list = [
@@ -14,6 +14,7 @@ urlpatterns: list = [
     path('posts/<int:post_id>/delete/', post_delete, name='post_delete'),
     path('posts/<int:post_id>/edit/', PostEditView.as_view(), name='post_edit'),
     path('posts/<int:post_id>/comment/', AddCommentView.as_view(), name='add_comment'),
+    path('search/', SearchView.as_view(), name='search'),
     path('follow/', FollowIndex.as_view(), name='follow_index'),
     path('profile/<str:username>/follow/', follow, name='profile_follow'),
     path('profile/<str:username>/unfollow/', unfollow, name='profile_unfollow'),
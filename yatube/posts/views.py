@@ -1,73 +1,149 @@
-from typing import Any, Dict, Optional, Type
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Type
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 
-from core.views import PostsListView
+from core.pagination import KeysetPaginator
+from core.views import COMMENTS_ON_PAGE, ConditionalGetMixin, PostsListView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Model
+from django.db.models import Exists, Model, OuterRef, Sum
 from django.forms import BaseForm, BaseModelForm
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse, reverse_lazy
+from django.utils.functional import cached_property
 from django.views.generic import CreateView, DetailView, UpdateView
 
+from . import recent, search, tasks, thumbnails, timeline
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import AuthorStats, Follow, Group, Post, User
 
 
 class IndexView(PostsListView):
     template_name: str = 'posts/index.html'
+    # Сессия, пользователь, COUNT(*), посты, миниатюры и запас на одну.
+    query_budget = 6
+    feed_scope = 'index'
     extra_context = {'title': 'Последние обновления на сайте'}
 
     def get_queryset(self):
-        return Post.objects.select_related('group', 'author').all()
+        return Post.objects.cards()
 
 
 class GroupListView(PostsListView):
     template_name: str = 'posts/group_list.html'
+    query_budget = 7
     context_object_name = 'posts'
     extra_context = {'title': 'Записи сообщества: '}
 
+    @cached_property
+    def group(self) -> Group:
+        return get_object_or_404(Group, slug=self.kwargs['group_slug'])
+
     def get_queryset(self):
-        return Post.objects.select_related('group', 'author').filter(
-            group__slug=self.kwargs['group_slug'])
+        return Post.objects.cards().filter(
+            group=self.group)
+
+    def get_feed_scope(self) -> str:
+        return f'group:{self.group.pk}'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['group'] = get_object_or_404(Group, slug=self.kwargs['group_slug'])
+        context['group'] = self.group
         return context
 
 
 class ProfileView(PostsListView):
     template_name: str = 'posts/profile.html'
+    query_budget = 7
     extra_context = {'title': 'Профайл пользователя: ', 'profile': True}
 
     def get_queryset(self):
-        return Post.objects.select_related('group', 'author').filter(
-            author__username=self.kwargs['username'])
+        return Post.objects.cards().filter(
+            author=self.author)
+
+    @cached_property
+    def author(self) -> User:
+        """Автор со счётчиками и признаком подписки одним запросом.
+
+        Используется и для выборки постов, и для шапки профиля."""
+        authors = User.objects.select_related('stats')
+        if self.request.user.is_authenticated:
+            authors = authors.annotate(is_following=Exists(
+                Follow.objects.filter(
+                    user_id=self.request.user.pk, author=OuterRef('pk'))))
+        return get_object_or_404(authors, username=self.kwargs['username'])
+
+    def get_feed_scope(self) -> str:
+        return f'profile:{self.author.pk}'
+
+    def get_known_count(self) -> Optional[int]:
+        try:
+            return self.author.stats.posts_count
+        except AuthorStats.DoesNotExist:
+            return None
+
+    def get_recent_posts(self, offset: int,
+                         limit: int) -> Optional[recent.PostList]:
+        return recent.author_posts(self.author.pk, offset, limit)
 
     def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        author = get_object_or_404(User, username=self.kwargs['username'])
+        author = self.author
         if self.request.user.is_authenticated:
-            follow = (self.request.user.follower.filter(author=author).exists()
-                      or author == self.request.user)
-            context['following'] = follow
-        context['author'] = get_object_or_404(User, username=self.kwargs['username'])
+            context['following'] = (
+                author.is_following or author == self.request.user)
+        context['author'] = author
+        return context
+
+
+class SearchView(PostsListView):
+    template_name: str = 'posts/search.html'
+    query_budget = 6
+    extra_context = {'title': 'Поиск'}
+    # Результаты упорядочены по релевантности, а не по дате.
+    keyset_pagination = False
+
+    def get_queryset(self):
+        return search.get_backend().search(
+            self.request.GET.get('q', '')).cards()
+
+    def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
         return context
 
 
-class PostDetailView(DetailView):
+class PostDetailView(ConditionalGetMixin, DetailView):
     model: Optional[Type[Model]] = Post
     template_name: str = 'posts/post_detail.html'
     context_object_name = 'post'
+    # Не зависит от числа комментариев: авторы выбираются одним JOIN.
+    query_budget: Optional[int] = 6
     extra_context = {'card_title': 'Отправить комментарий', 'button_text': 'Отправить'}
 
     def get_object(self):
-        return get_object_or_404(Post.objects.select_related('author', 'group'), id=self.kwargs['post_id'])
+        return get_object_or_404(
+            Post.objects.select_related('author__stats', 'group'),
+            id=self.kwargs['post_id'])
+
+    def get_validator_scopes(self) -> List[str]:
+        # Шапка поста выводит число постов автора из его профиля.
+        author_id = Post.objects.filter(
+            id=self.kwargs['post_id']).values_list(
+            'author_id', flat=True).first()
+        if author_id is None:
+            raise Http404
+        return [f'post:{self.kwargs["post_id"]}', f'profile:{author_id}']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        paginator = KeysetPaginator(
+            self.object.comments.select_related('author'), COMMENTS_ON_PAGE,
+            ordering=('created', 'id'), cursor_param='comments')
+        context['comments_page'] = paginator.page(
+            self.request.GET.get(paginator.cursor_param))
         context['form'] = CommentForm()
         context['action'] = reverse('posts:add_comment', args=(self.kwargs['post_id'],))
         return context
@@ -87,6 +163,7 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         new_post = form.save(commit=False)
         new_post.author = self.request.user
         new_post.save()
+        thumbnails.schedule(new_post.image.name)
         return redirect(self.get_success_url(new_post.author))
 
 
@@ -100,6 +177,15 @@ class PostEditView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def test_func(self) -> Optional[bool]:
         return self.get_object().author == self.request.user
 
+    def form_valid(self, form: BaseModelForm) -> HttpResponse:
+        # Сохраняются только поля формы: comments_count, прочитанный
+        # вместе с постом, мог измениться, пока шёл запрос.
+        self.object = form.save(commit=False)
+        self.object.save(update_fields=form._meta.fields)
+        if 'image' in form.changed_data:
+            thumbnails.schedule(self.object.image.name)
+        return HttpResponseRedirect(self.get_success_url())
+
     def handle_no_permission(self):
         post = self.get_object()
         if not self.request.user.is_authenticated:
@@ -114,7 +200,8 @@ def post_delete(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if post.author != request.user:
         return HttpResponseRedirect(post.get_absolute_url())
-    post.delete()
+    # Каскад по комментариям и лентам подписчиков удаляется в фоне.
+    tasks.delete_post.delay(post.pk)
     return redirect(reverse('posts:index'))
 
 
@@ -133,12 +220,30 @@ class AddCommentView(LoginRequiredMixin, CreateView):
 
 class FollowIndex(LoginRequiredMixin, PostsListView):
     template_name: str = 'posts/follow.html'
+    query_budget = 7
     extra_context = {'title': 'Посты избранных авторов'}
 
     def get_queryset(self):
-        return Post.objects.select_related('group', 'author').filter(
-            author_id__in=self.request.user.follower.all(
-            ).values_list('author_id'))
+        return timeline.follow_feed(self.request.user)
+
+    def get_count_key(self) -> Tuple[Optional[str], Hashable]:
+        # У ленты подписок нет поколения: число считается заново
+        # не чаще раза в FOLLOW_COUNT_TTL секунд.
+        return (f'follow:{self.request.user.pk}',
+                int(time.time() // settings.FOLLOW_COUNT_TTL))
+
+    def get_known_count(self) -> Optional[int]:
+        if not settings.RECENT_POSTS_ENABLED:
+            return None
+        # Сумма счётчиков авторов: страница из буферов posts.recent
+        # обходится без COUNT(*) по ленте.
+        return AuthorStats.objects.filter(
+            user__following__user=self.request.user
+        ).aggregate(count=Sum('posts_count'))['count']
+
+    def get_recent_posts(self, offset: int,
+                         limit: int) -> Optional[recent.PostList]:
+        return recent.follow_posts(self.request.user.pk, offset, limit)
 
 
 @login_required()
@@ -1,8 +1,31 @@
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
 from posts.models import User
 
+from users.tasks import send_password_reset_mail
+
 
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Письмо сброса пароля отправляет фоновая задача, а не запрос."""
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        # Аргументы задачи лежат в core_task открытым текстом, поэтому
+        # uid и токен сброса строит исполнитель, а в очередь уходят
+        # только id пользователя и адрес сайта.
+        context = {
+            'user': context['user'].pk,
+            'email': context['email'],
+            'domain': context['domain'],
+            'site_name': context['site_name'],
+            'protocol': context['protocol'],
+        }
+        send_password_reset_mail.delay(
+            subject_template_name, email_template_name, context,
+            from_email, to_email, html_email_template_name)
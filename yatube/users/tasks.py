@@ -0,0 +1,26 @@
+"""Фоновые задачи пользователей (core.tasks)."""
+from core.models import Task
+from core.tasks import task
+from django.contrib.auth.forms import PasswordResetForm
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from posts.models import User
+
+
+@task(priority=Task.PRIORITY_HIGH)
+def send_password_reset_mail(subject_template_name, email_template_name,
+                             context, from_email, to_email,
+                             html_email_template_name=None) -> None:
+    """Отправляет письмо сброса пароля. Токен строится здесь и нигде
+    не хранится: context содержит только id пользователя и адрес сайта."""
+    user = User.objects.filter(pk=context['user']).first()
+    if user is None:
+        return
+    context = dict(
+        context, user=user,
+        uid=urlsafe_base64_encode(force_bytes(user.pk)),
+        token=default_token_generator.make_token(user))
+    PasswordResetForm().send_mail(
+        subject_template_name, email_template_name, context,
+        from_email, to_email, html_email_template_name)
@@ -1,6 +1,13 @@
+import json
+
+from core import tasks
+from core.models import Task
 from django import forms
-from django.test import Client, TestCase
+from django.core import mail
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
 from posts.models import User
 
 names_templates = {
@@ -46,3 +53,21 @@ class TestUsersViews(TestCase):
             with self.subTest(value=value):
                 form_field = response.context['form'].fields[value]
                 self.assertIsInstance(form_field, expected)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_password_reset_mail_sent_by_task(self):
+        """Письмо сброса пароля отправляет фоновая задача."""
+        user = User.objects.create(
+            username='forgetful', email='forgetful@test.ru')
+        response = self.guest_client.post(
+            reverse('users:password_reset'), {'email': 'forgetful@test.ru'})
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(len(mail.outbox), 0)
+        arguments = json.loads(Task.objects.get().arguments)
+        self.assertEqual(arguments[0][2]['user'], user.pk)
+        self.assertNotIn('token', arguments[0][2])
+        self.assertNotIn('uid', arguments[0][2])
+        self.assertEqual(tasks.work('test', burst=True), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        self.assertIn(f'/auth/reset/{uid}/', mail.outbox[0].body)
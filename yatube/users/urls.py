@@ -8,6 +8,7 @@ from django.contrib.auth.views import (LoginView, LogoutView,
 from django.urls import path
 
 from users import views
+from users.forms import QueuedPasswordResetForm
 
 app_name = 'users'
 
@@ -19,7 +20,10 @@ urlpatterns = [
     path('signup/',
          views.SignUp.as_view(extra_context={'card_title': 'Зарегистрироваться', 'button_text': 'Подтвердить'}),
          name='signup'),
-    path('password_reset/', PasswordResetView.as_view(template_name='users/password_reset_form.html'),
+    path('password_reset/',
+         PasswordResetView.as_view(
+             template_name='users/password_reset_form.html',
+             form_class=QueuedPasswordResetForm),
          name='password_reset'),
 
     path('password_reset/done/', PasswordResetDoneView.as_view(template_name='users/password_reset_done.html'),
@@ -1,4 +1,5 @@
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -30,13 +31,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.HolePunchMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -122,11 +127,136 @@ LOGIN_REDIRECT_URL = '/'
 # Email
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Двухуровневый кэш (core.cache.TieredCache): LRU процесса перед общим
+# кэшем 'shared'. Общий кэш должен быть один на все процессы, иначе
+# поколения (core.generations) не сбрасывают чужие страницы. Здесь
+# это FileBasedCache; на сервере - Memcached или Redis (у FileBasedCache
+# add и incr не атомарны). Тесты работают с кэшем в памяти процесса:
+# они не стирают кэш разработчика и не делят каталог между прогонами.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_ENTRIES': 1000,
+            # Сколько секунд значение живёт в L1. Перезапись в другом
+            # процессе видна не позже; поколения в L1 не попадают.
+            'L1_TIMEOUT': 5,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, '.cache'),
+        'OPTIONS': {
+            # Вытеснение удаляет треть записей: поколения
+            # не должны уходить при каждой сотне страниц.
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+if TESTING:
+    CACHES['shared'] = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
     }
-}
+# Страницы лент и постов для анонимных посетителей целиком
+# (core.middleware.AnonymousPageCacheMiddleware) и общие оболочки страниц
+# для вошедших (core.middleware.HolePunchMiddleware); при разработке
+# выключено.
+PAGE_CACHE_ENABLED = not DEBUG
+PAGE_CACHE_TIME = 60 * 60 * 3
+# Промах фрагмента ленты пересобирает один процесс (core.cache.get_or_build),
+# остальные ждут его до CACHE_LEASE_WAIT секунд.
+CACHE_LEASE_TIMEOUT = 30
+CACHE_LEASE_WAIT = 2
 CACHE_TIME = 10
+# Отрисованные страницы лент сбрасываются сигналами (core.generations),
+# поэтому могут храниться долго.
+FEED_CACHE_TIME = 60 * 60 * 3
+
+# Число постов ленты для пагинатора (core.pagination.FeedPaginator):
+# COUNT(*) останавливается на FEED_COUNT_LIMIT, дальше - «много страниц».
+# При FEED_COUNT_ASYNC устаревшее число из кэша показывается, пока
+# фоновый поток считает новое. Ленту подписок пересчитывают
+# не чаще раза в FOLLOW_COUNT_TTL секунд.
+FEED_COUNT_LIMIT = 10000
+FEED_COUNT_ASYNC = not DEBUG
+FOLLOW_COUNT_TTL = 60
+
+# Админка больших таблиц (core.admin): COUNT(*) списка ограничен
+# ADMIN_COUNT_LIMIT строками и кэшируется на ADMIN_COUNT_TTL секунд.
+ADMIN_COUNT_LIMIT = 10000
+ADMIN_COUNT_TTL = 5 * 60
+
+# Последние RECENT_POSTS_LENGTH постов каждого автора в кэше (posts.recent):
+# первые страницы профиля и ленты подписок собираются из них.
+RECENT_POSTS_ENABLED = not DEBUG
+RECENT_POSTS_LENGTH = 100
+RECENT_POSTS_TIME = 60 * 60 * 3
+
+# Лента постов: True - постраничный вывод по курсору (created, id)
+# вместо номеров страниц, без OFFSET и COUNT(*).
+FEED_KEYSET_PAGINATION = False
+
+# Лента подписок: посты авторов, у которых подписчиков больше порога,
+# не раскладываются по лентам при публикации, а читаются напрямую.
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Метаданные миниатюр: LRU процесса перед общим кэшем и базой.
+# Отсутствие миниатюры кэшируется на THUMBNAIL_MISS_TIMEOUT секунд.
+THUMBNAIL_KVSTORE = 'core.kvstore.KVStore'
+THUMBNAIL_LOCAL_CACHE_SIZE = 1024
+THUMBNAIL_MISS_TIMEOUT = 30
+
+# Фоновые задачи (core.tasks) выполняют процессы команды run_tasks.
+# TASKS_EAGER - выполнять задачи сразу в процессе запроса, удобно
+# при разработке и в тестах. Упавшая задача повторяется через
+# TASKS_RETRY_DELAY * 2 ** (попытка - 1) секунд; задача исполнителя,
+# молчащего TASKS_LOCK_TIMEOUT секунд, возвращается в очередь.
+TASKS_EAGER = DEBUG
+TASKS_POLL_INTERVAL = 1
+TASKS_RETRY_DELAY = 10
+TASKS_LOCK_TIMEOUT = 60 * 10
+
+# Поиск по постам (posts.search): SQLite FTS5 или posts.search.SimpleBackend
+# для других баз. Релевантность старых постов уменьшается вдвое
+# за SEARCH_RECENCY_DAYS дней.
+SEARCH_BACKEND = 'posts.search.SqliteFTSBackend'
+SEARCH_RECENCY_DAYS = 30
+
+# Доля запросов, для которых core.middleware.RequestTimingMiddleware пишет
+# заголовок Server-Timing и строку в лог core.timing. 0 - выключено.
+REQUEST_TIMING_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+
+# Превышение бюджета запросов представления (core.budgets) на стенде:
+# 'log' - предупреждение в лог core.budgets, 'raise' - ошибка 500,
+# None - не проверять. В тестах бюджеты проверяет core.test.BudgetClient.
+QUERY_BUDGET_ACTION = None
+
+# Строки core.timing выводятся в консоль только при DEBUG (не в тестах);
+# на сервере к логгеру подключается свой обработчик.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'require_debug_true': {
+            '()': 'django.utils.log.RequireDebugTrue',
+        },
+    },
+    'handlers': {
+        'timing_console': {
+            'class': 'logging.StreamHandler',
+            'filters': ['require_debug_true'],
+        },
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['timing_console'],
+            'level': 'INFO',
+        },
+    },
+}
 
 